@@ -1,15 +1,25 @@
+import argparse
 import tkinter as tk
 # Importing the custom board
 import board
 
+# A different puzzle collection can be given to browse through. The 9x9 and 16x16 boards have one each that comes with
+# the game, a 25x25 board needs one to be given, e.g. python PlaySudoku.py my25.txt --size 25
+parser = argparse.ArgumentParser(description="Play Sudoku")
+parser.add_argument("puzzle_file", nargs="?", help="puzzle collection to play (see loader.py), default: the one for the size")
+parser.add_argument("--size", type=int, default=9, help="rows on the board: 9, 16 or 25 (default 9)")
+args = parser.parse_args()
+if args.puzzle_file is None and args.size not in board.COLLECTIONS:
+    parser.error("there is no %dx%d puzzle collection with the game, give one to play" % (args.size, args.size))
+
 # Initialising the board
 playWindow = tk.Tk() # Root window is created
 playWindow.title("Sudoku") # Title added
 side_size = 200 # This affects the amount of space on the right of the board (200 is needed)
-play_area = board.GameBoard(playWindow,side_size=side_size) # Initialising the game board within the root window
+play_area = board.GameBoard(playWindow,side_size=side_size,rows=args.size,columns=args.size,puzzle_file=args.puzzle_file) # Initialising the game board within the root window
 play_area.pack(side="top", fill="both", expand="true", padx=0, pady=0) # Packing and displaying (in TkInter everything to be displayed in a window needs to be either "packed" or "placed"
 playWindow.resizable(width=False, height=False) # This locks the size of the window so it cant be resized
-playWindow.geometry(str(play_area.size*9+side_size)+"x"+str(play_area.size*9)) # This locks the geometry including side_size to encompass the visuals
+playWindow.geometry(str(play_area.size*play_area.rows+side_size)+"x"+str(play_area.size*play_area.rows)) # This locks the geometry including side_size to encompass the visuals
 
 # As with most GUIs the game runs out of the host object which in this case is a GameBoard called board.
 # All the logic required to run a game of sudoku is included in the board class
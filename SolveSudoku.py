@@ -0,0 +1,91 @@
+import argparse
+import os
+import sys
+import time
+# Importing the headless solver (this script never opens a window)
+import solver
+import loader
+
+# Solves every puzzle in a file from the command line, e.g.
+#   python SolveSudoku.py puzzles
+#   python SolveSudoku.py corpus.txt -o solutions.tsv --workers 8 --chunk-size 500
+# The input can hold puzzles either as nine lines of nine digits (like the puzzles file) or one 81 character line per
+# puzzle, with 0 or . for empty squares, and may be gzip compressed. Each output line is: puzzle number, puzzle,
+# solution (or "none"), milliseconds
+
+
+def SolveChunk(puzzles):
+    '''
+    Runs in the worker processes and solves a batch of puzzles
+    :param puzzles: List of 81 character puzzle strings
+    :return: list: (solution or None, seconds taken) for each puzzle in the same order
+    '''
+    results = []
+    for puzzle in puzzles:
+        start = time.perf_counter()
+        try:
+            solution = solver.solve(puzzle)
+        except ValueError: # A malformed line is reported as unsolvable rather than stopping the run
+            solution = None
+        results.append((solution, time.perf_counter() - start))
+    return results
+
+
+def WriteChunk(out, first, puzzles, results):
+    '''
+    Writes one finished chunk to the output
+    :param out: Open text file
+    :param first: Number of the first puzzle in the chunk
+    :return: int: How many of the puzzles were solved
+    '''
+    lines = []
+    solved = 0
+    for number, (puzzle, (solution, seconds)) in enumerate(zip(puzzles, results), first):
+        lines.append("%d\t%s\t%s\t%.3f\n" % (number, puzzle, solution or "none", seconds * 1000))
+        if solution:
+            solved += 1
+    out.write("".join(lines))
+    return solved
+
+
+def SolveFile(puzzles, out, workers, chunk_size):
+    '''
+    Solves every puzzle in a collection on a pool of worker processes and writes the results to out in input order.
+    Only a fixed number of chunks are ever in flight so memory stays the same whatever the size of the file.
+    :param puzzles: Iterable of 81 character puzzles, e.g. a loader.PuzzleFile which streams them off disk
+    :param out: Open output file
+    :param workers: Number of worker processes (1 solves in this process)
+    :param chunk_size: Number of puzzles sent to a worker at a time
+    :return: (int, int): Puzzles read and puzzles solved
+    '''
+    total = 0
+    solved = 0
+    for chunk, results in loader.map_chunks(SolveChunk, puzzles, workers, chunk_size):
+        solved += WriteChunk(out, total, chunk, results)
+        total += len(chunk)
+    return total, solved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Solve every Sudoku puzzle in a file")
+    parser.add_argument("input", help="puzzle file (nine lines per puzzle or one 81 character line per puzzle, plain or gzip)")
+    parser.add_argument("-o", "--output", help="where to write the results (default: standard output)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: all cores)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=256, help="puzzles sent to a worker at a time (default: 256)")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+
+    start = time.perf_counter()
+    out = open(args.output, "w") if args.output else sys.stdout
+    try:
+        total, solved = SolveFile(loader.PuzzleFile(args.input), out, args.workers, args.chunk_size)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print("Solved %d of %d puzzles in %.2fs" % (solved, total, elapsed), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
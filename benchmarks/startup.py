@@ -0,0 +1,62 @@
+"""
+Cold start timing for the game.
+Each measurement runs in a fresh interpreter so nothing is already imported or loaded:
+    import     - importing the board module
+    window     - importing board, building a GameBoard and drawing it for the first time (needs a display)
+    interpreter - an empty interpreter, to subtract from the others
+Run from the repository root with
+    python benchmarks/startup.py [--repeat 10]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILDREN = {
+    "interpreter": "import time; start = time.perf_counter(); print(time.perf_counter() - start)",
+    "import": "import time; start = time.perf_counter(); import board; print(time.perf_counter() - start)",
+    "window": (
+        "import time; start = time.perf_counter()\n"
+        "import tkinter as tk\n"
+        "import board\n"
+        "root = tk.Tk()\n"
+        "play_area = board.GameBoard(root, side_size=200)\n"
+        "play_area.pack(side='top', fill='both', expand='true', padx=0, pady=0)\n"
+        "root.update()\n"
+        "print(time.perf_counter() - start)\n"
+        "root.destroy()\n"
+    ),
+}
+
+
+def Measure(name, repeat):
+    '''
+    Runs one of the child snippets repeat times in fresh interpreters
+    :return: list: Seconds for each run, or None if it couldn't run (e.g. no display for the window)
+    '''
+    times = []
+    for n in range(repeat):
+        result = subprocess.run([sys.executable, "-c", CHILDREN[name]], cwd=ROOT, capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        times.append(float(result.stdout.split()[-1]))
+    return times
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time how long the game takes to start")
+    parser.add_argument("--repeat", type=int, default=10, help="fresh interpreters per measurement (default: 10)")
+    args = parser.parse_args(argv)
+    for name in ("interpreter", "import", "window"):
+        times = Measure(name, args.repeat)
+        if times is None:
+            print("%-12s skipped (could not run, is there a display?)" % name)
+        else:
+            print("%-12s median %7.1f ms   min %7.1f ms" % (name, statistics.median(times) * 1000, min(times) * 1000))
+
+
+if __name__ == "__main__":
+    main()
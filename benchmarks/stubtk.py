@@ -0,0 +1,191 @@
+"""
+Stand-in for tkinter so the GameBoard benchmarks can run where there is no display and no Xvfb (e.g. a CI runner).
+Only what board.py uses is provided. Nothing is drawn: a canvas hands out item ids and remembers the options it was
+given, and the event loop is reduced to running the callbacks queued with after() whenever update() is called. Packing
+a canvas sends it one <Configure> event of its requested size, as Tk would when the window first appears, so the board
+builds its squares and pieces as usual.
+The times therefore cover the Python side of each GameBoard method (the board logic and the calls it makes on the
+canvas) but not Tk's drawing, and are kept apart from real display times in the baseline (see suite.py).
+"""
+import itertools
+
+TkVersion = 8.6
+_ids = itertools.count(1)
+_pending = [] # (after id, function, args) of every after() callback still to run, oldest first
+_configure = [] # Packed canvases still to get their first <Configure> event
+
+
+class TclError(Exception):
+    pass
+
+
+class Event(object):
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class Misc(object):
+    """
+    What every widget has
+    """
+    def __init__(self, master=None, **options):
+        self.master = master
+        self.options = options
+        self.bindings = {} # sequence -> callback
+
+    def config(self, **options):
+        self.options.update(options)
+
+    configure = config
+
+    def bind(self, sequence, func=None, add=None):
+        self.bindings[sequence] = func
+
+    def pack(self, **options):
+        pass
+
+    def place(self, **options):
+        pass
+
+    def focus_set(self):
+        pass
+
+    def title(self, text=None):
+        pass
+
+    def destroy(self):
+        pass
+
+    def quit(self):
+        pass
+
+    def after(self, ms, func, *args):
+        '''
+        Queues func to run at the next update(), whatever the delay
+        :return: str: id for after_cancel
+        '''
+        name = "after#%d" % next(_ids)
+        _pending.append((name, func, args))
+        return name
+
+    def after_cancel(self, name):
+        _pending[:] = [item for item in _pending if item[0] != name]
+
+    def update(self):
+        '''
+        Sends any first <Configure> events and runs the after() callbacks queued so far (not the ones they queue)
+        :return: None
+        '''
+        while _configure:
+            canvas = _configure.pop(0)
+            handler = canvas.bindings.get("<Configure>")
+            if handler is not None:
+                handler(Event(width=canvas.options.get("width", 0), height=canvas.options.get("height", 0)))
+        ready = _pending[:]
+        del _pending[:len(ready)]
+        for name, func, args in ready:
+            func(*args)
+
+    update_idletasks = update
+
+
+class Tk(Misc):
+    def __init__(self):
+        Misc.__init__(self)
+        del _pending[:]
+        del _configure[:]
+
+    def mainloop(self):
+        pass
+
+
+class Frame(Misc):
+    pass
+
+
+class Toplevel(Misc):
+    pass
+
+
+class Button(Misc):
+    pass
+
+
+class Label(Misc):
+    pass
+
+
+class Radiobutton(Misc):
+    pass
+
+
+class Entry(Misc):
+    pass
+
+
+class Text(Misc):
+    def delete(self, first, last=None):
+        pass
+
+    def insert(self, index, text):
+        pass
+
+
+class StringVar(object):
+    def __init__(self, master=None, value=""):
+        self.value = value
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+class PhotoImage(object):
+    def __init__(self, file=None, **options):
+        self.file = file
+
+
+class Canvas(Misc):
+    """
+    Keeps the options of every item so find_all and itemconfigure behave, without drawing anything
+    """
+    def __init__(self, master=None, **options):
+        Misc.__init__(self, master, **options)
+        self.items = {} # item id -> options
+
+    def pack(self, **options):
+        _configure.append(self)
+
+    def Create(self, options):
+        item = next(_ids)
+        self.items[item] = options
+        return item
+
+    def create_image(self, *coords, **options):
+        return self.Create(options)
+
+    def create_rectangle(self, *coords, **options):
+        return self.Create(options)
+
+    def create_text(self, *coords, **options):
+        return self.Create(options)
+
+    def itemconfigure(self, item, **options):
+        if item in self.items:
+            self.items[item].update(options)
+
+    itemconfig = itemconfigure
+
+    def coords(self, item, *coords):
+        pass
+
+    def tag_raise(self, tag, above=None):
+        pass
+
+    def tag_lower(self, tag, below=None):
+        pass
+
+    def find_all(self):
+        return tuple(self.items)
@@ -0,0 +1,321 @@
+"""
+Benchmark suite for the Sudoku logic and the GameBoard hot paths.
+Every benchmark runs over the fixed puzzles in corpus.txt (easy to extreme) so that results can be compared between
+changes. The GameBoard benchmarks draw with Tk: if there is no DISPLAY and Xvfb is installed a virtual display is
+started, otherwise they run against the stand-in for tkinter in stubtk.py, which times the board's own code without
+any drawing. Stub and real display times are never compared with each other.
+Each benchmark is run several times and compared on its fastest run, the one least disturbed by whatever else the
+machine was doing. On a shared machine the speed of the whole process also shifts by a third or more for seconds at a
+time, so every timed call is followed by a fixed reference workload and what is compared is the time relative to that
+reference. A change only counts as a regression if it is beyond both the threshold and twice the spread the baseline
+itself showed between its runs (median - fastest, which a single slow first run doesn't throw off), and anything that
+looks slower is run again (see --confirm) and only reported if it is still too slow over every round.
+    python benchmarks/suite.py                        # run and print
+    python benchmarks/suite.py -o results.json        # also write the results as JSON
+    python benchmarks/suite.py --save-baseline        # store the results as benchmarks/baseline.json
+    python benchmarks/suite.py --compare              # flag anything slower than the baseline (exit code 1 if so)
+    python benchmarks/suite.py --stub-tk              # time the GameBoard against stubtk.py even with a display
+"""
+import argparse
+import collections
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+import engine
+import logic
+import solver
+
+CORPUS = os.path.join(HERE, "corpus.txt")
+BASELINE = os.path.join(HERE, "baseline.json")
+
+# seconds: time the benchmark took, reference: time the Reference workload took straight after it on the same machine
+Sample = collections.namedtuple("Sample", "seconds reference")
+
+
+def ReadCorpus(path=CORPUS):
+    '''
+    :return: list: (puzzle, difficulty) pairs
+    '''
+    corpus = []
+    with open(path) as f:
+        for line in f:
+            if line.strip() and not line.startswith("#"):
+                puzzle, difficulty = line.split()
+                corpus.append((puzzle, difficulty))
+    return corpus
+
+
+def Reference():
+    '''
+    A fixed bit of pure Python work (about a millisecond) that tells how fast the machine is running at the moment
+    :return: None
+    '''
+    counts = {}
+    for n in range(40):
+        for i in range(81):
+            counts[i] = (counts.get(i, 0) + i) & 511
+
+
+def Time(func, repeat):
+    '''
+    Calls func repeat times, each followed by the Reference workload
+    :return: list: Sample of each call
+    '''
+    samples = []
+    for n in range(repeat):
+        start = time.perf_counter()
+        func()
+        middle = time.perf_counter()
+        Reference()
+        samples.append(Sample(middle - start, time.perf_counter() - middle))
+    return samples
+
+
+def Summary(samples):
+    '''
+    :param samples: list of Sample
+    :return: dict: Median and fastest time, and the median time relative to the reference workload (what is compared,
+             the median so that one reference run held up by something else doesn't skew it)
+    '''
+    times = [sample.seconds for sample in samples]
+    return {"median": statistics.median(times), "min": min(times), "runs": len(times),
+            "relative": statistics.median(sample.seconds / sample.reference for sample in samples)}
+
+
+def HeadlessBenchmarks(corpus, repeat):
+    '''
+    Benchmarks that don't need a window
+    :return: dict: name -> list of times
+    '''
+    results = {}
+    for difficulty in sorted(set(d for p, d in corpus)):
+        puzzles = [p for p, d in corpus if d == difficulty]
+        results["solver.solve/" + difficulty] = Time(lambda: [solver.solve(p) for p in puzzles], repeat)
+        results["logic.analyse/" + difficulty] = Time(lambda: [logic.analyse(p) for p in puzzles], repeat)
+
+    solutions = [solver.solve(puzzle) for puzzle, difficulty in corpus]
+
+    def PlaceRemove():
+        for (puzzle, difficulty), solution in zip(corpus, solutions):
+            state = engine.BoardState(puzzle)
+            for i, ch in enumerate(puzzle):
+                if ch == "0":
+                    state.Place(i // 9, i % 9, int(solution[i]))
+            for i, ch in enumerate(puzzle):
+                if ch == "0":
+                    state.Remove(i // 9, i % 9)
+    results["engine.Place+Remove"] = Time(PlaceRemove, repeat)
+    return results
+
+
+def VirtualDisplay():
+    '''
+    Starts Xvfb when there is no display to draw on
+    :return: subprocess.Popen or None if a display is already set or Xvfb isn't installed
+    '''
+    if os.environ.get("DISPLAY") or not shutil.which("Xvfb"):
+        return None
+    display = ":%d" % (90 + os.getpid() % 100)
+    process = subprocess.Popen(["Xvfb", display, "-screen", "0", "1280x1024x24"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5) # Give the server a moment to come up
+    os.environ["DISPLAY"] = display
+    return process
+
+
+def Add(first, second):
+    '''
+    :return: Sample: Two samples added together, for a benchmark made up of many timed calls
+    '''
+    return Sample(first.seconds + second.seconds, first.reference + second.reference)
+
+
+def GuiBenchmarks(corpus, repeat, stub=False):
+    '''
+    Benchmarks of the GameBoard methods the player triggers, drawn onto a real (or virtual) Tk display
+    :param stub: Use stubtk.py instead of Tk, which is also what happens when Tk can't open a window
+    :return: (dict, str): name -> list of times, and "tk" or "stub" for what they were run against
+    '''
+    import tkinter as tk
+    root = None
+    if not stub:
+        try:
+            root = tk.Tk()
+        except tk.TclError:
+            pass
+    if root is None: # board.py has to see the stand-in when it is imported
+        import stubtk as tk
+        sys.modules["tkinter"] = tk
+        root = tk.Tk()
+    import board
+    import cache
+    play_area = board.GameBoard(root, side_size=200)
+    play_area.cache = cache.AnalysisCache(None) # Keep the on-disk cache out of it
+    play_area.fill_ms = 0 # AutoComplete is timed without its animation delay
+    play_area.pack(side="top", fill="both", expand="true", padx=0, pady=0)
+    root.update()
+    play_area.initiated = True
+
+    def Wait():
+        while play_area.Busy(): # Background work finishes through the event loop
+            root.update()
+
+    def Load(puzzle):
+        play_area.Cancel()
+        play_area.ClearBoard()
+        play_area.DisplayBoard([puzzle[row*9:row*9 + 9] for row in range(9)])
+        Wait()
+
+    play_area.BasicCheck() # The first call imports NumPy, which isn't what is being timed
+    results = {"GameBoard.BasicCheck": [], "MoveQueue.Reset": [], "GameBoard.AddNum+RemoveNum": [],
+               "GameBoard.PencilValues": [], "GameBoard.AutoComplete": []}
+    for n in range(repeat):
+        times = dict((name, Sample(0.0, 0.0)) for name in results)
+
+        def Run(name, func):
+            times[name] = Add(times[name], Time(func, 1)[0]) # Added up over the corpus
+
+        for puzzle, difficulty in corpus:
+            solution = solver.solve(puzzle)
+            Load(puzzle)
+            Run("GameBoard.BasicCheck", play_area.BasicCheck)
+            Run("MoveQueue.Reset", play_area.moves.Reset) # Rebuilding the hint queue from scratch
+
+            def AddRemove():
+                for i, ch in enumerate(puzzle):
+                    if ch == "0":
+                        play_area.AddNum(solution[i], play_area.Glyph(solution[i]), i // 9, i % 9)
+                        play_area.RemoveNum(i // 9, i % 9)
+                root.update()
+            Run("GameBoard.AddNum+RemoveNum", AddRemove)
+
+            def Pencil():
+                play_area.ClearAllPencil()
+                play_area.PencilValues()
+                root.update()
+            Run("GameBoard.PencilValues", Pencil)
+
+            Load(puzzle)
+            Run("GameBoard.AutoComplete", lambda: (play_area.AutoComplete(), Wait()))
+        for name in results:
+            results[name].append(times[name])
+    root.destroy()
+    return results, "stub" if tk.__name__ == "stubtk" else "tk"
+
+
+def Compare(results, baseline, threshold, skip=()):
+    '''
+    Finds the benchmarks that have got slower than the baseline, comparing their times relative to the reference
+    workload. The slowdown has to be more than the threshold and more than twice the baseline's own spread
+    (median / fastest run - 1) to count, so the millisecond benchmarks don't flag noise.
+    :param threshold: Allowed slowdown as a fraction, e.g. 0.2 = 20%
+    :param skip: Names not to compare, e.g. GameBoard times from a stub run against a baseline from a real display
+    :return: list: (name, baseline min, new min, slowdown as a fraction) for every regression
+    '''
+    regressions = []
+    for name, result in sorted(results.items()):
+        before = baseline.get("results", {}).get(name)
+        if not before or name in skip:
+            continue
+        spread = before["median"] / before["min"] - 1
+        if "relative" in before:
+            slowdown = result["relative"] / before["relative"] - 1
+        else: # A baseline from before the reference workload, only the times themselves can be compared
+            slowdown = result["min"] / before["min"] - 1
+        if slowdown > max(threshold, 2 * spread):
+            regressions.append((name, before["min"], result["min"], slowdown))
+    return regressions
+
+
+def RunAll(corpus, repeat, no_gui=False, stub_tk=False):
+    '''
+    Runs every benchmark
+    :return: (dict, str or None): name -> list of times, and what the GameBoard benchmarks ran against (None if skipped)
+    '''
+    times = HeadlessBenchmarks(corpus, repeat)
+    if no_gui:
+        return times, None
+    xvfb = None if stub_tk else VirtualDisplay()
+    try:
+        gui, display = GuiBenchmarks(corpus, repeat, stub_tk)
+    finally:
+        if xvfb is not None:
+            xvfb.terminate()
+    times.update(gui)
+    return times, display
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Sudoku benchmark suite")
+    parser.add_argument("-r", "--repeat", type=int, default=10, help="times to run each benchmark (default: 10)")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="compare against the baseline and flag regressions")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline file (default: benchmarks/baseline.json)")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown counted as a regression (default: 0.2)")
+    parser.add_argument("--no-gui", action="store_true", help="skip the GameBoard benchmarks")
+    parser.add_argument("--stub-tk", action="store_true", help="run the GameBoard benchmarks against stubtk.py")
+    parser.add_argument("--confirm", type=int, default=2, help="extra rounds run to confirm a regression before it is "
+                        "reported (default: 2)")
+    args = parser.parse_args(argv)
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    corpus = ReadCorpus()
+    times, display = RunAll(corpus, args.repeat, args.no_gui, args.stub_tk) # display: "tk", "stub" or None
+    skipped = ["gui"] if args.no_gui else []
+
+    report = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "puzzles": len(corpus),
+                 "repeat": args.repeat, "skipped": skipped, "gui": display, "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": dict((name, Summary(value)) for name, value in times.items()),
+    }
+    for name, result in sorted(report["results"].items()):
+        print("%-32s median %9.2f ms   min %9.2f ms" % (name, result["median"] * 1000, result["min"] * 1000))
+    if skipped:
+        print("skipped: " + ", ".join(skipped))
+    if display == "stub":
+        print("GameBoard benchmarks ran against stubtk.py, nothing was drawn")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        skip = ()
+        if display and baseline.get("meta", {}).get("gui") != display: # A stub run says nothing about Tk drawing times
+            skip = [name for name in times if name.startswith(("GameBoard.", "MoveQueue."))]
+            print("GameBoard benchmarks not compared, the baseline ran them against %s" % baseline.get("meta", {}).get("gui"))
+        regressions = Compare(report["results"], baseline, args.threshold, skip)
+        for n in range(args.confirm):
+            if not regressions:
+                break
+            print("Running again to confirm %d possible regressions" % len(regressions))
+            more, display = RunAll(corpus, args.repeat, args.no_gui, args.stub_tk)
+            for name, value in more.items():
+                times[name].extend(value)
+            results = dict((name, Summary(value)) for name, value in times.items())
+            regressions = Compare(results, baseline, args.threshold, skip)
+        for name, before, after, slowdown in regressions:
+            print("REGRESSION %-32s min %.2f ms -> %.2f ms (%+.0f%% against the reference)" % (name, before * 1000, after * 1000,
+                                                                                           slowdown * 100))
+        if regressions:
+            sys.exit(1)
+        print("No regressions against " + args.baseline)
+
+
+if __name__ == "__main__":
+    main()
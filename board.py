@@ -1,23 +1,82 @@
 import tkinter as tk
-import pandas as pd
-import numpy as np
-import base64
+import array
 import math
+import os
+import queue
+import threading
 import time
+# The board state itself lives in engine so that the Sudoku logic can be run without a window
+import engine
+import solver
+import logic
+import cache
+import generator
+import history
+import hints
+import profiling
+import savegame
+import loader
+import validate
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Images") # Found from here rather than the working directory
+SAVE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "saved_game.sdk") # Where Save Game and Resume look
+# The puzzle collections that come with the game for each board size (rows), the others need one to be given
+COLLECTIONS = {9: os.path.join(os.path.dirname(os.path.abspath(__file__)), "puzzles"),
+               16: os.path.join(os.path.dirname(os.path.abspath(__file__)), "puzzles16")}
+_images = {} # Every PhotoImage loaded so far, shared by all GameBoards in the process
+
+
+def load_image(name):
+    '''
+    Loads one of the pictures from the Images folder the first time it is asked for and hands back the same object after
+    :param name: File name without the .png, e.g. "7", "7_mini" or "pencil"
+    :return: tk.PhotoImage
+    '''
+    image = _images.get(name)
+    if image is None:
+        image = tk.PhotoImage(file=os.path.join(IMAGE_DIR, name+".png")) # Tk reads the PNG straight from the file
+        _images[name] = image
+    return image
+
+
+def load_numpy():
+    '''
+    Imports NumPy when a method first needs it rather than at the top, so opening the window doesn't wait for it
+    :return: module: numpy
+    '''
+    import numpy # Only loaded once, after that it is a lookup in sys.modules
+    return numpy
+
+
+class ImageHolder(object):
+    """
+    Dictionary style access to the pictures that only loads each one when it is first used
+    """
+    def __getitem__(self, name):
+        return load_image(name)
+
+POLL_MS = 20 # How often the main loop checks for work finished in the background
+FILL_MS = 40 # Time between digits as AutoComplete fills the board, whatever the solver took
+
+# The GameBoard methods timed when profiling is switched on
+PROFILED = ("PlacePiece", "CalculateMoves", "UpdatePossibles", "Hint", "PencilValues", "AutoComplete", "refresh")
 
 class GameBoard(tk.Frame):
     """
     The main host that is called to start the game
     """
-    def __init__(self, parent, side_size, square_size=80, rows=9, columns=9, color="#D3D3D3"):
+    def __init__(self, parent, side_size, square_size=80, rows=9, columns=9, color="#D3D3D3", profile=None, puzzle_file=None):
         '''
         The GameBoard object hosts the whole game. Upon iitialisation the Sudoku squares are created and pieces drawn.
         :param parent: The tk root window inside of which you want the board to be drawn
         :param side_size: Dictates the width of the side panel with the game controls
-        :param square_size: The size of the chess board in pixels
-        :param rows: Rows in the chess board (default = 8)
-        :param columns: Columns in the chess board (defailt = 8)
+        :param square_size: The size of each square in pixels on a 9x9 board, bigger boards shrink the squares to fit
+        :param rows: Rows in the board, 9 for the normal game, 16 or 25 for the bigger boards (or 4)
+        :param columns: Columns in the board, always the same as rows
         :param color: This defines the background board colour
+        :param profile: Time the hot paths and add a Stats button, None leaves it to the SUDOKU_PROFILE environment variable
+        :param puzzle_file: Collection of puzzles that can be browsed by number (see loader.py), None for the one in
+                            COLLECTIONS that matches the board size
         '''
         # There is no need to edit any of the sizes. The default for side_size is 200
         # The default colors here are pure white and a dark gray
@@ -25,49 +84,86 @@ class GameBoard(tk.Frame):
         # ---------------- Section 1 : Assembling basic variables ----------------
         self.rows = rows
         self.columns = columns
-        self.size = square_size # This is the size in pixels of each square. This is essentially limited by the size of the chess piece images which are 60x60
+        if rows != columns:
+            raise ValueError("A Sudoku board needs as many columns as rows")
+        # The board is made of n x n boxes (n = 3 for 9x9, 4 for 16x16, 5 for 25x25). The lookup tables for that size are
+        # shared with the engine and raise a ValueError for anything that isn't a Sudoku board
+        self.geometry = engine.geometry_for(rows * columns)
+        n = self.geometry.BOX_SIZE
+        self.size = square_size * 9 // rows # This is the size in pixels of each square. This is essentially limited by the size of the chess piece images which are 60x60
         # In my experience the actual size of the squares isn't 80 when drawn. This is likely an overlap issue but comes out at 77
-        self.square_virtual_size = 77 # So a variable is created to allow this to be carried throughout placement calculations
+        # The canvas loses 20 pixels to its padding and 1 to the edge, so it is (720 - 21) // 9 = 77 on a 9x9 board
+        self.square_virtual_size = (rows * self.size - 21) // rows # So a variable is created to allow this to be carried throughout placement calculations
         self.top_offset = 2 # This accounts for the thickness of the lines
+        # The pictures in the Images folder only go up to 9 and are drawn for 9x9 squares, the other boards write their
+        # digits (1-9 then A, B, C...) as text sized to the squares
+        self.images = n == 3
 
         self.side_size = side_size # The amount of blank space to the right of the board
         self.color = color # Colour 1 is the colour in the top left of the board
         self.initiated = False # Has a game started and effects the interpretation of clicks on the canvas
 
-        # All of the piece objects are held within a pandas DataFrame in their relative locations.
-        # These variable ultimately describes the state of the game
-        # BoardArray reflects the state of the visual board the player can see (only for main numbers)
-        self.boardArray = pd.DataFrame(np.zeros((self.rows,self.columns)),index=range(0,self.rows),columns=range(0,self.columns))
-        # bigSquares is used to perform some Sudoku calculations by holding the values present in the 3x3 squares.
-        self.bigSquares = pd.DataFrame(np.empty((3,3),dtype=np.str),index=range(0,3),columns=range(0,3))
-        # Column track and row track similarly allow Sudoku calculations to be applied to the board
-        self.columnTrack = pd.DataFrame(np.empty((1,9),dtype=np.str),columns=range(0,9))
-        self.rowTrack = pd.DataFrame(np.empty((9,1),dtype=np.str),index=range(0,9))
+        # The state of the game is held by an engine.BoardState which tracks the digits in each cell along with bit masks
+        # of the digits used in every row, column and 3x3 square. The GameBoard is just a view over it.
+        self.state = engine.BoardState(box_size=n)
+        # The remaining per-cell tables are flat lists indexed by row*9 + col (row*16 + col on a 16x16 board and so on)
         # basicMoves stores the possible base Sudoku moves that can be performed by the player
-        self.basicMoves = pd.DataFrame(np.zeros((self.rows,self.columns)),index=range(0,self.rows),columns=range(0,self.columns))
-        # manualPencils stores the pencil moves that have been added and reflects board visuals
-        self.manualPencils = pd.DataFrame(np.empty((9,9),dtype=np.str),index=range(0,9),columns=range(0,9))
+        self.basicMoves = [0] * self.geometry.CELLS
+        # The naked and hidden singles are also queued up in moves, which is patched along with basicPossibles so a hint
+        # never has to search the board. lookahead holds the step the logical solver found in the background for when
+        # there are no singles left: (board string, logic.Step or None)
+        self.moves = hints.MoveQueue(self.state)
+        self.lookahead = None
+        # basicPossibles stores the mask of the digits that base Sudoku rules allow in each cell (bit 0 = digit 1). It is
+        # patched for the changed cell and its peers every time a number is added or removed rather than being rebuilt
+        self.basicPossibles = [self.geometry.ALL] * self.geometry.CELLS
+        # pencilMasks stores the pencil marks showing in each cell as a digit mask, like basicPossibles, in a flat array.
+        # The whole board changes (auto pencil, clearing) compare masks to find the few cells that need redrawing
+        self.pencilMasks = array.array("H" if self.geometry.SIZE <= 16 else "L", [0]) * self.geometry.CELLS
 
         self.desiredSquare = [] # This is the square that the player wants to interact with and is locked using the select piece button
         self.falseSquare = [] # Allows squares to be cleared when the player has clicked an occupied square
         self.validClick = False # This allows the board to know if a valid square to move to has been selected or not. This is stored on this level as it effects labels
         self.moveSquare = [] # This is the square that the player wants to move to
+        # Solutions and analyses of puzzles are cached on disk so replaying a puzzle doesn't mean working it out again
+        self.cache = cache.AnalysisCache()
+        self.analysis = None # cache.Entry for the puzzle currently loaded
+        self.validation = None # validate.Validation of the puzzle currently loaded
+        self.givens = "0" * self.geometry.CELLS # The puzzle as it was loaded, kept for saving the game
+        self.startTime = time.time() # When the current stretch of play started
+        self.elapsedBefore = 0.0 # Seconds played before that, for resumed games
+        self.pool = generator.PuzzlePool() # Puzzles made in advance by generator.py, dealt out by Start and Reset Board
+        if puzzle_file is None:
+            puzzle_file = COLLECTIONS.get(rows, "puzzles%d" % rows) # A missing file is reported when a game starts
+        self.puzzles = loader.PuzzleFile(puzzle_file, box_size=n) # Read a puzzle at a time, however big the collection is
+        self.puzzleIndex = 0 # The puzzle from the collection used when the pool has nothing
+
+        # Solving, hints and analysis run in worker threads so the window never freezes. Results come back through a
+        # queue that the Tk main loop polls with after()
+        self.results = queue.Queue() # (job name, generation, callback, (result, error)) from the workers
+        self.jobs = {} # job name -> generation of the latest request, anything older is thrown away when it arrives
+        self.running = 0 # Worker threads whose results haven't been collected yet
+        self.fill = [] # (index, digit) still to be drawn by the AutoComplete animation
+        self.fillAfter = None # The pending after() call of the animation
+        self.fill_ms = FILL_MS
+        # Every digit and pencil change is logged so it can be undone and redone (see history.py)
+        self.history = history.MoveHistory(self.TakeSnapshot)
 
-        # Adding all of the pictures from Images folder
-        self.imageHolder = {} # Creating a dictionary
-        pieceList = "0123456789" # These are all the different types of pieces possible
-        for f in pieceList: # Cycling through the pieces
-            for add in ["","_mini"]:
-                with open("Images/"+f+add+".png","rb") as imageFile: # Opening the photo within the variable space
-                    # The images can't be stored as P or p in MacOS as they're read the same
-                    # So the colour is introduced by adding b or w after the piece notation
-                    string = base64.b64encode(imageFile.read()) # Creating a string that describes the gif in base64 format
-                    self.imageHolder[f+add] = tk.PhotoImage(data=string)
-        with open("Images/pencil.png","rb") as imageFile:
-            string = base64.b64encode(imageFile.read())
-            self.imageHolder["pencil"] = tk.PhotoImage(data=string)
-        # List that is used to control the location of pencil values within a square
-        self.shift = [[0,0],[-5,-5],[0,-5],[5,-5],[-5,0],[0,0],[5,0],[-5,5],[0,5],[5,5]]
+        # The pictures from the Images folder ("0"-"9", "0_mini"-"9_mini" and "pencil") are loaded the first time they
+        # are drawn rather than all up front, which keeps the window quick to open
+        self.imageHolder = ImageHolder()
+        # List that is used to control the location of pencil values within a square. Pencil value num sits in an n x n
+        # grid within the square (like the keys of a phone on a 9x9 board) and this holds its steps from the centre
+        self.shift = [[0,0]] + [[k % n - (n-1)/2, k // n - (n-1)/2] for k in range(self.geometry.SIZE)]
+
+        # Profiling is opt in. The methods are only wrapped when it is on (and before the buttons and key bindings take
+        # references to them) so a normal game runs the plain methods with no overhead at all
+        if profile is None:
+            profile = profiling.enabled_by_environment()
+        self.profiler = None
+        if profile:
+            self.profiler = profiling.Profiler(os.environ.get("SUDOKU_PROFILE_FILE"))
+            self.profiler.Wrap(self, PROFILED, after=self.SampleCanvas)
 
         # ---------------- Section 2 : Creating the board ----------------
         # The whole board is drawn within the window in TkInter
@@ -81,6 +177,9 @@ class GameBoard(tk.Frame):
         # This is self explanatory and provides a blank space upon which visual objects can be placed
         self.canvas = tk.Canvas(self, borderwidth=0, highlightthickness=0, width=c_width, height=c_height, background="bisque")
         self.canvas.pack(side="top", fill="both", expand=True, padx=10, pady=10) # Packed with a small amount of padding either side
+        # Every cell gets a digit slot and a pencil slot for every digit up front. Moves then only show, hide or reconfigure these
+        # items rather than deleting and recreating canvas items
+        self.CreateSlots()
 
         # Adding a quit button to allow the window to be terminated. This has the same effect as clicking the cross
         self.quit_button = tk.Button(self,text="Quit Game", fg="red", command=self.quit)
@@ -91,7 +190,7 @@ class GameBoard(tk.Frame):
         self.reset_button.place(x=self.square_virtual_size*self.rows + 115, y=110, height=16)
         self.start_button = tk.Button(self,text="Start!",fg="green",background="black",font=("TKDefaultFont",30), command=self.Initiate)
         self.start_button.place(x=self.square_virtual_size * self.rows+20,y=104,height=28)
-        self.canvas.create_rectangle(self.square_virtual_size*9 + 6,232,self.square_virtual_size*9 + 10+192,302,width=2) # Just a hollow rectangle to denote an area
+        self.canvas.create_rectangle(self.square_virtual_size*self.rows + 6,232,self.square_virtual_size*self.rows + 10+192,302,width=2) # Just a hollow rectangle to denote an area
         self.pencil_mode = tk.Label(self,text="Pencil Mode:", bg="bisque")
         self.pencil_mode.place(x=self.square_virtual_size * self.rows+20,y=250,height=28)
         self.pencil_indicator = tk.StringVar()
@@ -106,29 +205,54 @@ class GameBoard(tk.Frame):
         self.auto_pencil_button.place(x=self.square_virtual_size * self.rows+25,y=285,height=20)
         self.auto_complete_button = tk.Button(self,text="Auto Complete",fg="green",background="black",font=("TKDefaultFont",20), command=self.AutoComplete)
         self.auto_complete_button.place(x=self.square_virtual_size * self.rows+50,y=325,height=20)
+        self.hint_button = tk.Button(self,text="Hint",fg="green",background="black",font=("TKDefaultFont",20), command=self.Hint)
+        self.hint_button.place(x=self.square_virtual_size * self.rows+80,y=355,height=20)
+        self.hint_text = tk.StringVar() # Names the technique behind the last hint
+        self.hint_text.set("")
+        self.hint_label = tk.Label(self,textvariable=self.hint_text, bg="bisque")
+        self.hint_label.place(x=self.square_virtual_size * self.rows+17,y=385,height=16)
+        self.undo_button = tk.Button(self,text="Undo",fg="orange",background="black",font=("TKDefaultFont",15), command=self.Undo)
+        self.undo_button.place(x=self.square_virtual_size * self.rows+25,y=415,height=20)
+        self.redo_button = tk.Button(self,text="Redo",fg="orange",background="black",font=("TKDefaultFont",15), command=self.Redo)
+        self.redo_button.place(x=self.square_virtual_size * self.rows+115,y=415,height=20)
+        self.save_button = tk.Button(self,text="Save Game",fg="blue",background="black",font=("TKDefaultFont",15), command=self.SaveGame)
+        self.save_button.place(x=self.square_virtual_size * self.rows+25,y=445,height=20)
+        self.resume_button = tk.Button(self,text="Resume",fg="blue",background="black",font=("TKDefaultFont",15), command=self.LoadGame)
+        self.resume_button.place(x=self.square_virtual_size * self.rows+115,y=445,height=20)
+        self.puzzle_label = tk.Label(self,text="Puzzle #", bg="bisque")
+        self.puzzle_label.place(x=self.square_virtual_size * self.rows+25,y=475,height=20)
+        self.puzzle_number = tk.StringVar()
+        self.puzzle_number.set("1")
+        self.puzzle_entry = tk.Entry(self,textvariable=self.puzzle_number,width=7)
+        self.puzzle_entry.place(x=self.square_virtual_size * self.rows+85,y=475,height=20)
+        self.puzzle_button = tk.Button(self,text="Go",fg="green",background="black",font=("TKDefaultFont",15), command=self.GoToPuzzle)
+        self.puzzle_button.place(x=self.square_virtual_size * self.rows+150,y=475,height=20)
+        if self.profiler is not None: # The stats panel is only offered when there is something to show
+            self.stats_button = tk.Button(self,text="Stats",fg="blue",background="black",font=("TKDefaultFont",15), command=self.ShowStats)
+            self.stats_button.place(x=self.square_virtual_size * self.rows+80,y=505,height=20)
 
         # Adding information about the game
-        self.canvas.create_rectangle(self.square_virtual_size*9 + 6,2,self.square_virtual_size*9 + 10+192,90,width=2) # Just a hollow rectangle to denote an area
+        self.canvas.create_rectangle(self.square_virtual_size*self.rows + 6,2,self.square_virtual_size*self.rows + 10+192,90,width=2) # Just a hollow rectangle to denote an area
         self.selection_heading = tk.Label(self,text="Current Game:",font=("TKDefaultFont",18),bg="bisque") # Heading
-        self.selection_heading.place(x=self.square_virtual_size*9 + 36, y=18, height=16)
+        self.selection_heading.place(x=self.square_virtual_size*self.rows + 36, y=18, height=16)
         self.square_text_x = tk.StringVar() # StringVar variables can be dynamically changed
         self.square_text_x.set("Selected Square (x) = None")
         self.selected_displaysx = tk.Label(self,textvariable=self.square_text_x, bg="bisque")
-        self.selected_displaysx.place(x=self.square_virtual_size*9+17, y=40, height=16)
+        self.selected_displaysx.place(x=self.square_virtual_size*self.rows+17, y=40, height=16)
         self.square_text_y = tk.StringVar()
         self.square_text_y.set("Selected Square (y) = None")
         self.selected_displaysy = tk.Label(self,textvariable=self.square_text_y, bg="bisque")
-        self.selected_displaysy.place(x=self.square_virtual_size*9 + 17, y=60, height=16)
+        self.selected_displaysy.place(x=self.square_virtual_size*self.rows + 17, y=60, height=16)
         self.square_text_displaypiece = tk.StringVar()
         self.square_text_displaypiece.set("Selected Piece = None")
         self.selected_displaypiece = tk.Label(self,textvariable=self.square_text_displaypiece, bg="bisque")
-        self.selected_displaypiece.place(x=self.square_virtual_size*9 + 17, y=80, height=16)
+        self.selected_displaypiece.place(x=self.square_virtual_size*self.rows + 17, y=80, height=16)
 
         # Binding configuration and left mouse click
         self.canvas.bind("<Button 1>",self.GetCoords) # This allows the clicking to be tracked
         # Adding all the numbers for adding values
         self.canvas.focus_set()
-        self.canvas.bind("<Key>",self.Delete)  # This allows the clicking to be tracked
+        self.canvas.bind("<Key>",self.KeyPressed)  # Backspace and the letters of the bigger boards
         self.canvas.bind("1",self.One) # This allows the clicking to be tracked
         self.canvas.bind("2",self.Two) # This allows the clicking to be tracked
         self.canvas.bind("3",self.Three) # This allows the clicking to be tracked
@@ -138,6 +262,10 @@ class GameBoard(tk.Frame):
         self.canvas.bind("7",self.Seven) # This allows the clicking to be tracked
         self.canvas.bind("8",self.Eight) # This allows the clicking to be tracked
         self.canvas.bind("9",self.Nine) # This allows the clicking to be tracked
+        self.canvas.bind("<Control-z>",lambda event: self.Undo())
+        self.canvas.bind("<Control-y>",lambda event: self.Redo())
+        self.canvas.bind("<Control-Home>",lambda event: self.JumpTo(0)) # Back to the puzzle as it was loaded
+        self.canvas.bind("<Control-End>",lambda event: self.JumpTo(len(self.history.actions))) # Redo everything
 
         # If a the user changes the window size then the refresh call is made. This is defined below
         # This function is also used to make the board
@@ -171,18 +299,13 @@ class GameBoard(tk.Frame):
         col = math.floor(xcoords / offset) # Finding the square the player means
         row = math.floor(ycoords / offset)
         if col <= self.columns-1 and row <= self.rows-1: # Have we clicked within the bounds of the board
-            self.HighlightSquare(row,col,"blue",'highlight') # Adding a blue edge around the square
+            self.ClearHighlight("highlight")  # Clear highlighting
             # Then checking for what piece that is
-            if self.boardArray.loc[row,col] != 0:
+            if self.state.cells[row*self.columns + col] != 0:
                 self.validClick = False
-                self.canvas.delete("highlight")  # Clear highlighting
-                self.canvas.delete("example")
                 self.HighlightSquare(row,col,"red",'highlight')  # Display a red edge
                 self.falseSquare = [row,col]
             else:
-                self.canvas.delete("move")  # Clearing all types of highlighting currently o the board
-                self.canvas.delete("highlight")
-                self.canvas.delete("example")
                 self.HighlightSquare(row,col,"blue",'highlight') # Adding a blue edge around the square
                 self.desiredSquare = [row,col] # Saving this information in the desiredSquare variable
                 self.validClick = True
@@ -200,30 +323,126 @@ class GameBoard(tk.Frame):
         offset = self.square_virtual_size # Finding the sze of a square
         if colour == "green": # If the colour requested is green we use a lighter colour
             colour = "#00cc00" # This is just a lighter green than the standard "green" color to make it clearer on the board
-        self.canvas.create_line(col * offset,row * offset,col * offset+offset,row * offset,fill=colour,width=3,tag=tag) # Adding in the 4 lines
-        self.canvas.create_line(col * offset,row * offset,col * offset,row * offset+offset,fill=colour,width=3,tag=tag)
-        self.canvas.create_line(col * offset+offset,row * offset+offset,col * offset+offset,row * offset,fill=colour,width=3,tag=tag)
-        self.canvas.create_line(col * offset+offset,row * offset+offset,col * offset,row * offset+offset,fill=colour,width=3,tag=tag)
+        # Highlight rectangles are kept once made and reused, only a tag that needs more boxes than ever before makes one
+        items = self.highlightItems.setdefault(tag, [])
+        used = self.highlightUsed.get(tag, 0)
+        if used < len(items):
+            item = items[used]
+            self.canvas.coords(item, col * offset, row * offset, col * offset+offset, row * offset+offset)
+            self.canvas.itemconfigure(item, outline=colour, state="normal")
+        else:
+            item = self.canvas.create_rectangle(col * offset, row * offset, col * offset+offset, row * offset+offset, outline=colour, width=3, tag=tag)
+            items.append(item)
+        self.highlightUsed[tag] = used + 1
+
+    def ClearHighlight(self, tag):
+        '''
+        Hides the highlight boxes with a given tag so that they can be reused
+        :param tag: The tag given to HighlightSquare
+        :return: None
+        '''
+        if self.highlightUsed.get(tag, 0):
+            for item in self.highlightItems[tag]:
+                self.canvas.itemconfigure(item, state="hidden")
+            self.highlightUsed[tag] = 0
 
-    def AddNum(self, name, image, row, column):
+    def CreateSlots(self):
+        '''
+        Creates the hidden canvas items for the digit and the pencil marks of every cell along with the lookups used to
+        reach them. The items are only ever moved, shown, hidden or given a new image (or text) after this.
+        :return: None
+        '''
+        self.highlightItems = {} # tag -> rectangles made so far
+        self.highlightUsed = {} # tag -> how many of them are showing
+        self.digitSlots = [] # Canvas item of the digit in each cell
+        self.pencilSlots = [] # Canvas item of pencil mark num in each cell at index*SIZE + num-1 (SIZE = 9 on a 9x9 board)
+        self.squareItems = [] # The background squares and 3x3 outlines, made by refresh
+        self.bigSquareItems = []
+        geometry = self.geometry
+        for index in range(geometry.CELLS):
+            row = geometry.ROW[index]
+            col = geometry.COL[index]
+            name = geometry.NAME[index] # "row_col", shared with the engine rather than built here
+            x0, y0 = self.CellCentre(row, col)
+            self.digitSlots.append(self.CreateSlot(x0, y0, (name, "piece"), False))
+            for num in range(1, geometry.SIZE + 1):
+                x0, y0 = self.PencilCentre(row, col, num)
+                self.pencilSlots.append(self.CreateSlot(x0, y0, (name+"p"+engine.SYMBOLS[num - 1], "pencil"), True))
+
+    def CreateSlot(self, x0, y0, tag, mini):
+        '''
+        Makes one hidden digit or pencil slot, a picture on a 9x9 board and text on the others
+        :param tag: Canvas tags of the item
+        :param mini: True for a pencil slot
+        :return: int: Canvas item
+        '''
+        if self.images:
+            return self.canvas.create_image(x0, y0, tag=tag, anchor="c", state="hidden")
+        return self.canvas.create_text(x0, y0, text="", font=self.Font(mini), tag=tag, anchor="c", state="hidden")
+
+    def Font(self, mini):
+        '''
+        :param mini: True for the pencil marks
+        :return: tuple: Font for the digits written as text, in pixels (negative in Tk) so that it follows the squares
+        '''
+        if mini:
+            return ("TKDefaultFont", -max(int(self.PencilSpacing()), 6))
+        return ("TKDefaultFont", -int(self.size * 0.6))
+
+    def Glyph(self, name, mini=False):
+        '''
+        :param name: Digit as it is written, e.g. "7" or "C"
+        :param mini: The small version used for pencil marks
+        :return: dict: Canvas item options that show the digit in a slot made by CreateSlot
+        '''
+        if self.images:
+            return {"image": self.imageHolder[name+"_mini" if mini else name]}
+        return {"text": name}
+
+    def CellCentre(self, row, col):
+        '''
+        :return: (int, int): Pixel position of the middle of a cell
+        '''
+        return (col * self.size) + int(self.size/2) + 2, (row * self.size) + int(self.size/2) + 2
+
+    def PencilCentre(self, row, col, num):
+        '''
+        :return: (int, int): Pixel position of pencil mark num within a cell
+        '''
+        x0, y0 = self.CellCentre(row, col)
+        spacing = self.PencilSpacing()
+        return x0 + self.shift[num][0]*spacing, y0 + self.shift[num][1]*spacing
+
+    def PencilSpacing(self):
+        '''
+        :return: float: Pixels between neighbouring pencil marks in a square (25 on a 9x9 board)
+        '''
+        return self.size / (self.geometry.BOX_SIZE + 0.2)
+
+    def AddNum(self, name, glyph, row, column):
         '''
         Adds a picture of the piece to the board at the square defined by row/column
-        :param name: Piece name such as r3 or K1
-        :param image: An image from the imageholder dictionary
+        :param name: Digit as it is written, e.g. "7" (or "C" on a 16x16 board)
+        :param glyph: Canvas options from Glyph
         :param row: Target row on the board
         :param column: Target column on the board
         :return: None
         '''
-        # We can add a piece to the board at the requested location
-        x0 = (column * self.size) + int(self.size/2) + 2 # Works out where it should be in pixels
-        y0 = (row * self.size) + int(self.size/2) + 2
-        tag_name = str(row)+"_"+str(column)
-        self.canvas.create_image(x0,y0, image=image, tag=(tag_name, "piece"), anchor="c") # First we create the image in the top left
-        self.boardArray.loc[row,column] = int(name)
-        self.bigSquares.loc[math.floor(row/3), math.floor(column/3)] += name
-        self.columnTrack.loc[0,column] += name
-        self.rowTrack.loc[row,0] += name
-        self.basicMoves.loc[row,column] = 0
+        # The cell already has a digit slot so it just needs the right image showing
+        index = row*self.geometry.SIZE + column
+        num = engine.VALUES[name]
+        self.canvas.itemconfigure(self.digitSlots[index], state="normal", **glyph)
+        self.state.Place(row, column, num) # Updates the cell and the row/column/square masks in one go
+        self.history.Record(history.Move("digit", index, 0, num))
+        self.basicMoves[index] = 0
+        self.UpdatePossibles(index)
+        if not self.history.replaying: # When undoing or redoing the eliminations come back as moves of their own
+            # The digit can't go anywhere else in the row, column or box any more so it comes out of their pencil marks
+            pencils = self.pencilMasks
+            bit = 1 << (num-1)
+            for peer in self.geometry.PEERS[index]:
+                if pencils[peer] & bit:
+                    self.SetPencils(peer, pencils[peer] & ~bit)
 
     def RemoveNum(self, row, col):
         '''
@@ -232,12 +451,23 @@ class GameBoard(tk.Frame):
         :param col: Colum to remove
         :return: None
         '''
-        name = str(row)+"_"+str(col)
-        self.canvas.delete(name) # Removes it based on its location id
-        self.bigSquares.loc[math.floor(row / 3),math.floor(col / 3)] = self.bigSquares.loc[math.floor(row / 3),math.floor(col / 3)].strip(str(self.boardArray.loc[row,col]))
-        self.rowTrack.loc[row,0] = self.rowTrack.loc[row,0].strip(str(self.boardArray.loc[row,col]))
-        self.columnTrack.loc[0,col] = self.columnTrack.loc[0,col].strip(str(self.boardArray.loc[row,col]))
-        self.boardArray.loc[row,col] = 0
+        index = row*self.geometry.SIZE + col
+        self.canvas.itemconfigure(self.digitSlots[index], state="hidden") # The slot is kept for the next digit
+        num = self.state.Remove(row, col) # Releases the digit from the row/column/square masks
+        self.history.Record(history.Move("digit", index, num, 0))
+        self.UpdatePossibles(index)
+
+    def UpdatePossibles(self, index):
+        '''
+        Copies the candidates of a cell and its peers (20 on a 9x9 board) out of the board state after that cell has changed
+        :param index: The cell that changed (row*9 + col)
+        :return: None
+        '''
+        candidates = self.state.candidates
+        self.basicPossibles[index] = candidates[index]
+        for peer in self.geometry.PEERS[index]:
+            self.basicPossibles[peer] = candidates[peer]
+        self.moves.SyncAround(index) # The move queue follows the same cells
 
     def PencilToggle(self):
         if self.pencil_indicator.get() == "On":
@@ -255,143 +485,383 @@ class GameBoard(tk.Frame):
         
     def PencilValues(self):
         '''
-        Pencils in all values that are possibilities
+        Pencils in all values that are possibilities. These start from the basic candidates and then have anything the
+        logical solver can eliminate (pointing pairs, subsets, X-wings etc) taken out.
         :return: None
         '''
-        self.BasicCheck()
-        self.canvas.delete("pencil")
-        for row_check in range(0,self.rows):
-            for col_check in range(0,self.columns):
-                options = self.basicPossibles.loc[row_check,col_check]
-                if len(options) > 0:
-                    for x in options:
-                        self.AddPencil(x,self.imageHolder[x+"_mini"],row_check,col_check)
-        self.manualPencils = self.basicPossibles
+        masks = logic.pencil_marks(self.state.cells)[0] # The steps behind the marks aren't shown
+        self.SetAllPencils(masks)
 
     def ClearAllPencil(self):
         '''
         Clear all pencil marks
         :return: None
         '''
-        self.canvas.delete("pencil")
-        self.manualPencils = pd.DataFrame(np.empty((9,9),dtype=np.str),index=range(0,9),columns=range(0,9))
+        self.SetAllPencils([0] * self.geometry.CELLS)
 
-    def AddPencil(self, name, image, row, column):
+    def SetAllPencils(self, masks):
+        '''
+        Changes the pencil marks of the whole board as one action, only the cells that differ are touched on the canvas
+        :param masks: The pencil mask of every cell
+        :return: None
+        '''
+        # A plain comparison of 81 small ints, each changed cell is then redrawn on its own by SetPencils anyway
+        current = self.pencilMasks
+        changed = [index for index, mask in enumerate(masks) if mask != current[index]]
+        if not changed:
+            return
+        self.history.Begin() # Undone in one go
+        for index in changed:
+            self.SetPencils(index, masks[index])
+        self.history.End()
+
+    def AddPencil(self, name, glyph, row, column):
         '''
         Adds in a penciled value
-        :param name: Piece name such as r3 or K1
-        :param image: An image from the imageholder dictionary
+        :param name: Digit as it is written, e.g. "7"
+        :param glyph: Canvas options from Glyph
         :param row: Target row on the board
         :param column: Target column on the board
         :return: None
         '''
-        # We can add a piece to the board at the requested location
-        x0 = (column * self.size) + int(self.size/2) + 2 # Works out where it should be in pixels
-        y0 = (row * self.size) + int(self.size/2) + 2
-        tag_name = str(row)+"_"+str(column)+"p"+name
-        x0 += self.shift[int(name)][0]*5
-        y0 += self.shift[int(name)][1]*5
-        self.canvas.create_image(x0,y0, image=image, tag=(tag_name, "pencil"), anchor="c") # First we create the image in the top left
+        # Each cell has a slot for every pencil value already sitting in the right place
+        size = self.geometry.SIZE
+        index = row*size + column
+        num = engine.VALUES[name]
+        self.canvas.itemconfigure(self.pencilSlots[index*size + num-1], state="normal", **glyph)
+        old = self.pencilMasks[index]
+        if not old >> (num-1) & 1:
+            self.pencilMasks[index] = old | 1 << (num-1)
+            self.history.Record(history.Move("pencil", index, old, old | 1 << (num-1))) # After the change so snapshots include it
 
     def RemovePencil(self, row, col, value):
         '''
         Removes a penciled value
         :param row: Row to remove
         :param col: Colum to remove
+        :param value: Digit as it is written or "All"
         :return: None
         '''
-        if value == "All":
-            for num in self.manualPencils.loc[row,col]:
-                name = str(row)+"_"+str(col)+"p"+num
-                self.canvas.delete(name) # Removes it based on its location id
-                self.manualPencils.loc[row,col] = self.manualPencils.loc[row,col].split(num)[1]
-        else:
-            name = str(row)+"_"+str(col)+"p"+value
-            self.canvas.delete(name)  # Removes it based on its location id
-            self.manualPencils.loc[row,col] = self.manualPencils.loc[row,col].split(value)[1]
+        index = row*self.geometry.SIZE + col
+        old = self.pencilMasks[index]
+        self.SetPencils(index, 0 if value == "All" else old & ~(1 << (engine.VALUES[value]-1)))
+
+    def SetPencils(self, index, marks):
+        '''
+        Changes the pencil marks of a cell to exactly the given digits, only touching the marks that differ
+        :param index: Cell (row*9 + col)
+        :param marks: int: Mask of the digits to show, e.g. 0b1001001 for 1, 4 and 7
+        :return: None
+        '''
+        old = self.pencilMasks[index]
+        if old == marks:
+            return
+        slots = self.pencilSlots
+        first = index*self.geometry.SIZE - 1 # Slot of digit num is first + num
+        changed = old ^ marks
+        while changed:
+            bit = changed & -changed
+            changed ^= bit
+            num = bit.bit_length()
+            if marks & bit:
+                self.canvas.itemconfigure(slots[first + num], state="normal", **self.Glyph(engine.SYMBOLS[num - 1], mini=True))
+            else:
+                self.canvas.itemconfigure(slots[first + num], state="hidden")
+        self.pencilMasks[index] = marks
+        self.history.Record(history.Move("pencil", index, old, marks))
+
+    def Undo(self):
+        '''
+        Takes back the last action
+        :return: None
+        '''
+        self.Cancel("autocomplete", "hint")
+        moves = self.history.Undo()
+        if moves is not None:
+            self.Replay(None, [(move, False) for move in moves])
+
+    def Redo(self):
+        '''
+        Puts back the last action that was undone
+        :return: None
+        '''
+        self.Cancel("autocomplete", "hint")
+        moves = self.history.Redo()
+        if moves is not None:
+            self.Replay(None, [(move, True) for move in moves])
+
+    def JumpTo(self, position):
+        '''
+        Moves the board to any point in the history, e.g. 0 for the puzzle as it was loaded (Ctrl+Home) or the last
+        action (Ctrl+End)
+        :param position: Number of actions since the puzzle was loaded
+        :return: None
+        '''
+        self.Cancel("autocomplete", "hint")
+        self.Replay(*self.history.Plan(position))
+
+    def Replay(self, snapshot, steps):
+        '''
+        Applies moves from the history without logging them again
+        :param snapshot: history.Snapshot to restore first or None
+        :param steps: list of (history.Move, forward)
+        :return: None
+        '''
+        self.history.replaying = True
+        try:
+            if snapshot is not None:
+                for index in range(self.geometry.CELLS):
+                    self.SetDigit(index, snapshot.grid[index])
+                    self.SetPencils(index, snapshot.pencils[index])
+            for move, forward in steps:
+                value = move.after if forward else move.before
+                if move.kind == "digit":
+                    self.SetDigit(move.index, value)
+                else:
+                    self.SetPencils(move.index, value)
+        finally:
+            self.history.replaying = False
+        self.history.Visited()
+        self.ClearHighlight("hint")
+        self.ClearHighlight("highlight")
+        self.validClick = False
+        self.CalculateMoves()
+
+    def SetDigit(self, index, num):
+        '''
+        Makes a cell hold a digit (0 for empty), only touching it if it is different
+        :return: None
+        '''
+        current = self.state.cells[index]
+        if current == num:
+            return
+        row = self.geometry.ROW[index]
+        col = self.geometry.COL[index]
+        if current:
+            self.RemoveNum(row, col)
+        if num:
+            name = engine.SYMBOLS[num - 1]
+            self.AddNum(name, self.Glyph(name), row, col)
+
+    def TakeSnapshot(self):
+        '''
+        :return: history.Snapshot of the digits and pencil marks on the board
+        '''
+        return history.make_snapshot(self.state.cells, self.pencilMasks)
 
     def CalculateMoves(self):
         '''
         Updates all of the checks after a move has been made (this might have to be streamlined if it takes too long
         :return: None
         '''
-        # Checking if basic Sudoku logic can be used
-        self.BasicCheck()
-        
+        # basicPossibles and the move queue have already been patched by AddNum/RemoveNum so the basic Sudoku moves are
+        # just read off the queue
+        queued = self.moves.Moves()
+        if engine.CHECK_CANDIDATES: # Debugging aid, the queue has to agree with working the singles out from scratch
+            self.BasicCheck()
+            # Only which cells have a move is compared, with clashing digits on the board a cell can be the only place
+            # left for two digits and the checks needn't pick the same one
+            assert [bool(num) for num in self.basicMoves] == [bool(num) for num in queued]
+        self.basicMoves = queued
+        if self.moves.Next() is None and not self.state.IsFull():
+            # Nothing simple left, so the next step of the logical solver is worked out now, ready for when a hint is asked for
+            puzzle = self.state.ToString()
+            self.RunInBackground("lookahead", lambda: (puzzle, logic.next_step(puzzle)), self.LookaheadReady)
+
+    def LookaheadReady(self, result):
+        '''
+        :param result: (board string, logic.Step or None) from the background
+        :return: None
+        '''
+        self.lookahead = result
+
     def BasicCheck(self):
         '''
-        Checks using base Sudoku rules
-        This is wrong! 1 in 0 5
-        :return: None
-        '''
-        self.basicPossibles = pd.DataFrame(np.empty((9,9),dtype=np.str),index=range(0,9),columns=range(0,9))
-        for row_scan in range(0, self.rows):
-            for col_scan in range(0,self.columns):
-                for num in range(1, 10):
-                    if self.boardArray.loc[row_scan,col_scan] == 0:
-                        if str(num) not in self.bigSquares.loc[math.floor(row_scan/3), math.floor((col_scan/3))]:
-                            if str(num) not in self.columnTrack.loc[0,col_scan]:
-                                if str(num) not in self.rowTrack.loc[row_scan,0]:
-                                    self.basicPossibles.loc[row_scan,col_scan] += str(num)
-        if not self.basicPossibles.all().all() == "":
-            for row_scan in range(0,3):
-                for col_scan in range(0,3):
-                    for num in range(1, 10):
-                        num_place = 0
-                        num_loc = [10,10]
-                        for row_add in range(0,3):
-                            for col_add in range(0,3):
-                                if self.boardArray.loc[row_scan*3+row_add,col_scan*3+col_add] == 0:
-                                    if str(num) in self.basicPossibles.loc[row_scan*3+row_add,col_scan*3+col_add]:
-                                        num_place += 1
-                                        num_loc = [row_scan*3+row_add,col_scan*3+col_add]
-                        if num_place == 1:
-                            print("Row: "+str(num_loc[0])+" and Col: "+str(num_loc[1])+" = "+str(num))
-                            self.basicMoves.loc[num_loc[0],num_loc[1]] == num
+        Checks using base Sudoku rules and stores every naked and hidden single in basicMoves. Play reads them off the
+        move queue instead, this is the full recalculation it is checked against
+        :return: None
+        '''
+        # basicPossibles is kept up to date as moves are made so there is no need to recalculate it here
+        if engine.CHECK_CANDIDATES: # Debugging aid, compares against a full recalculation
+            assert self.basicPossibles == self.state.RecomputeCandidates()
+        for index, options in enumerate(self.basicPossibles):
+            self.basicMoves[index] = options.bit_length() if options and not options & (options - 1) else 0 # Naked singles
+        self.HiddenCheck()
 
     def HiddenCheck(self):
         '''
-        Checks if any of the possible values can be eliminated by simple logic
+        Finds the digits that only have one place left in a row, column or square and adds them to basicMoves
+        :return: None
+        '''
+        # This is the single board (N = 1) case of the batched NumPy checks
+        np = load_numpy()
+        import vectorised
+        singles = vectorised.hidden_singles(vectorised.candidates(self.BoardArray()))[0]
+        for row_scan, col_scan in zip(*np.nonzero(singles)):
+            self.basicMoves[row_scan*self.columns + col_scan] = int(singles[row_scan, col_scan])
+
+    def BoardArray(self):
+        '''
+        :return: np.ndarray: The board as a (1, 9, 9) uint8 array for the vectorised checks ((1, 16, 16) on a 16x16 board)
+        '''
+        np = load_numpy()
+        return np.array(self.state.cells, dtype=np.uint8).reshape(1, self.rows, self.columns)
+
+    def Hint(self):
+        '''
+        Highlights the cells affected by the next logical step. Singles come straight off the move queue and anything
+        harder has usually been worked out in the background after the last move, only if it hasn't is it worked out now
+        :return: None
+        '''
+        self.ClearHighlight("hint")
+        step = self.moves.Next()
+        if step is not None:
+            self.ShowHint(step)
+            return
+        if self.lookahead is not None and self.lookahead[0] == self.state.ToString(): # Still the board it was found for
+            self.ShowHint(self.lookahead[1])
+            return
+        self.hint_text.set("Thinking...")
+        puzzle = self.state.ToString() # Only the string goes to the worker, it never touches the board or Tk
+        self.RunInBackground("hint", lambda: logic.next_step(puzzle), self.ShowHint)
+
+    def ShowHint(self, step):
+        '''
+        Highlights the cells affected by a step and names the technique
+        :param step: logic.Step or None
         :return: None
         '''
-        for row_scan in range(0,3):
-            for col_scan in range(0,3):
-                for num in range(1, 10):
-                    for row_add in range(0,3):
-                        for col_add in range(0,3):
-                            if self.boardArray.loc[row_scan*3+row_add,col_scan*3+col_add] == 0:
-                                if row_scan*3+row_add ==  2 and col_scan*3+col_add == 2:
-                                    t = 1
-                                if str(num) in self.basicPossibles.loc[row_scan*3+row_add,col_scan*3+col_add]:
-                                    num_place += 1
-                                    num_loc = [row_scan*3+row_add,col_scan*3+col_add]
-                    if num_place == 1:
-                        print("Row: "+str(num_loc[0])+" and Col: "+str(num_loc[1])+" = "+str(num))
+        if step is None: # Either the board is finished, a wrong digit has been entered or it needs guessing
+            self.hint_text.set("No hint available")
+            return
+        self.hint_text.set("Hint: "+step.technique)
+        targets = set(index for index, num in step.placements + step.eliminations)
+        for index in targets:
+            self.HighlightSquare(self.geometry.ROW[index], self.geometry.COL[index], "green", "hint")
 
     def AutoComplete(self):
         '''
-        Completed the board
+        Completes the board using the headless solver. The solve happens in the background and the digits are then drawn
+        one at a time at a fixed pace
         :return: None
         '''
-        self.BasicCheck()
-        for row_check in range(0,self.rows):
-            for col_check in range(0,self.columns):
-                options = self.basicPossibles.loc[row_check,col_check]
-                if len(options) == 1:
-                    self.AddNum(options,self.imageHolder[options],row_check,col_check)
-                    self.update()
-                    self.AutoComplete()
-                    return
+        self.Cancel("autocomplete")
+        puzzle = self.state.ToString()
+        entry = self.analysis
+
+        def Solve():
+            if entry is not None and entry.solution is not None:
+                # The cached solution is good as long as every digit so far agrees with it
+                if all(num == "0" or num == entry.solution[index] for index, num in enumerate(puzzle)):
+                    return entry.solution
+            return solver.solve(puzzle) # The solver works on the same one character per cell string as the puzzles file
+        self.RunInBackground("autocomplete", Solve, self.StartFill)
+
+    def StartFill(self, solution):
+        '''
+        Starts drawing a solution into the empty cells
+        :param solution: One character per cell or None if the board as it stands can't be completed
+        :return: None
+        '''
+        if solution is None: # A wrong digit has been entered
+            return
+        self.fill = [(index, num) for index, num in enumerate(solution) if self.state.cells[index] == 0]
+        if self.fill:
+            self.history.Begin() # The whole fill is undone as one action, ended by FillStep or Cancel
+            self.FillStep()
+
+    def FillStep(self):
+        '''
+        Draws the next digit of the AutoComplete animation and books the one after
+        :return: None
+        '''
+        self.fillAfter = None
+        if not self.fill:
+            return
+        index, num = self.fill.pop(0)
+        row_check = self.geometry.ROW[index]
+        col_check = self.geometry.COL[index]
+        if self.state.Get(row_check,col_check) == 0:
+            self.RemovePencil(row_check,col_check,"All")
+            self.AddNum(num,self.Glyph(num),row_check,col_check)
+        if self.fill:
+            self.fillAfter = self.after(self.fill_ms, self.FillStep)
+        else:
+            self.history.End()
+            self.CalculateMoves()
+
+    def RunInBackground(self, name, work, done):
+        '''
+        Runs work() in a worker thread and passes its result to done() on the Tk thread. Starting a job with the same name
+        again supersedes the earlier one, whose result is thrown away when it arrives.
+        :param name: Kind of job, e.g. "hint", used for cancelling
+        :param work: Function to run, it must not touch Tk or the board
+        :param done: Called with the result in the main loop
+        :return: None
+        '''
+        generation = self.jobs.get(name, 0) + 1
+        self.jobs[name] = generation
+
+        def Worker():
+            try:
+                result = (work(), None)
+            except Exception as error: # Passed back so it is reported from the main loop like any other callback error
+                result = (None, error)
+            self.results.put((name, generation, done, result))
+        threading.Thread(target=Worker, daemon=True).start()
+        self.running += 1
+        if self.running == 1: # Polling only runs while something is outstanding
+            self.after(POLL_MS, self.PollJobs)
+
+    def PollJobs(self):
+        '''
+        Collects finished background work and hands on the results that are still wanted
+        :return: None
+        '''
+        finished = []
+        while True:
+            try:
+                finished.append(self.results.get_nowait())
+            except queue.Empty:
+                break
+        self.running -= len(finished)
+        if self.running:
+            self.after(POLL_MS, self.PollJobs)
+        for name, generation, done, (result, error) in finished:
+            if self.jobs.get(name) != generation: # Cancelled or replaced while it was running
+                continue
+            if error is not None:
+                raise error
+            done(result)
+
+    def Cancel(self, *names):
+        '''
+        Drops the results of background jobs and stops the AutoComplete animation
+        :param names: Jobs to cancel, all of them if none are given
+        :return: None
+        '''
+        for name in names or list(self.jobs):
+            self.jobs[name] = self.jobs.get(name, 0) + 1
+        if not names or "autocomplete" in names:
+            if self.fill: # Stopped part way through, what has been drawn so far still makes one action
+                self.history.End()
+            self.fill = []
+            if self.fillAfter is not None:
+                self.after_cancel(self.fillAfter)
+                self.fillAfter = None
+
+    def Busy(self):
+        '''
+        :return: bool: True while background work or the AutoComplete animation is still going
+        '''
+        return self.running > 0 or bool(self.fill)
 
     def EndCheck(self):
         """
         Checks the state of the board to detect them all being full
         :return: bool: True for the game is over, false if not
         """
-        if self.boardArray.where(self.boardArray==0,1).sum().sum() == 81:
-            return True
-        else:
-            return False
+        return self.state.IsFull()
 
     def One(self, event):
         if self.validClick:
@@ -429,33 +899,46 @@ class GameBoard(tk.Frame):
         if self.validClick:
             self.PlacePiece("9")
 
+    def KeyPressed(self, event):
+        '''
+        Handles the keys without a binding of their own, backspace and the letters used as digits on the bigger boards
+        :param event: A key press
+        :return: None
+        '''
+        if event.keysym == "BackSpace":
+            self.Delete(event)
+        elif self.validClick and event.char and event.char in engine.VALUES:
+            self.PlacePiece(event.char)
+
     def PlacePiece(self, number):
         '''
         Called by the keybind functions
-        :param number: The number to be places
+        :param number: The number to be places, e.g. "7" or "C" (either case) on a 16x16 board
         :return: None
         '''
+        value = engine.VALUES.get(number, 0)
+        if not 1 <= value <= self.geometry.SIZE: # e.g. a 5 on a 4x4 board
+            return
+        number = engine.SYMBOLS[value - 1]
+        self.Cancel("autocomplete", "hint") # Typing takes over from any solving in progress
         row = self.desiredSquare[0]
         col = self.desiredSquare[1]
         if self.pencilled:
-            if self.manualPencils.loc[row,col] == 0:
-                self.AddPencil(number,self.imageHolder[number+"_mini"],row,col)
-                self.manualPencils.loc[row,col] = number
+            if not self.pencilMasks[row*self.columns + col] >> (value-1) & 1:
+                self.AddPencil(number,self.Glyph(number, mini=True),row,col) # Also records it in pencilMasks
             else:
-                if number not in self.manualPencils.loc[row,col]:
-                    self.AddPencil(number,self.imageHolder[number+"_mini"],row,col)
-                    self.manualPencils.loc[row,col] += number
-                else:
-                    self.RemovePencil(row,col,number)
+                self.RemovePencil(row,col,number)
 
         else:
-            self.AddNum(number,self.imageHolder[number],row,col)
+            self.history.Begin() # The digit and the pencil marks it clears are undone together
+            self.AddNum(number,self.Glyph(number),row,col)
             self.RemovePencil(row,col,"All")
+            self.history.End()
             self.CalculateMoves()
+            self.ClearHighlight("hint") # Any hint is out of date now
             self.validClick = False
             self.falseSquare = self.desiredSquare
-            self.canvas.delete("highlight")  # Clear highlighting
-            self.canvas.delete("example")
+            self.ClearHighlight("highlight")  # Clear highlighting
             self.HighlightSquare(row,col,"orange",'highlight')  # Adding a blue edge around the square
 
     def Delete(self, event):
@@ -463,9 +946,11 @@ class GameBoard(tk.Frame):
             if not self.validClick:
                 row = self.falseSquare[0]
                 col = self.falseSquare[1]
+                self.Cancel("autocomplete", "hint")
                 self.RemoveNum(row,col)
-                self.canvas.delete("highlight")  # Clear highlighting
-                self.canvas.delete("example")
+                self.CalculateMoves()
+                self.ClearHighlight("hint")
+                self.ClearHighlight("highlight")  # Clear highlighting
                 self.HighlightSquare(row,col,"orange",'highlight')  # Adding a blue edge around the square
 
     def Initiate(self):
@@ -474,35 +959,224 @@ class GameBoard(tk.Frame):
         :return: None
         '''
         # This function starts the game upon request
+        puzzle = self.pool.Next() if self.geometry.BOX_SIZE == 3 else None # Pre-generated (9x9) puzzles are used first
+        if puzzle is None: # Falling back on the puzzle collection if there is no pool or it has run out
+            try:
+                puzzle = self.puzzles[self.puzzleIndex]
+            except (IndexError, OSError): # e.g. a collection with no puzzles of this board's size
+                self.hint_text.set("No %dx%d puzzles to play" % (self.rows, self.columns))
+                return
+        self.StartPuzzle(puzzle)
+
+    def GoToPuzzle(self, index=None):
+        '''
+        Starts a puzzle picked by number from the collection. Only that puzzle is read, found through the collection's index
+        :param index: Puzzle number from 0, None takes the number (from 1) typed into the side panel
+        :return: None
+        '''
+        if index is None:
+            try:
+                index = int(self.puzzle_number.get()) - 1
+            except ValueError:
+                self.hint_text.set("Not a puzzle number")
+                return
+        try:
+            if index < 0:
+                raise IndexError(index)
+            puzzle = self.puzzles[index]
+        except (IndexError, OSError):
+            self.hint_text.set("No puzzle "+str(index + 1))
+            return
+        self.puzzleIndex = index
+        self.puzzle_number.set(str(index + 1))
+        self.StartPuzzle(puzzle)
+
+    def StartPuzzle(self, puzzle):
+        '''
+        Clears the board and starts a new game
+        :param puzzle: Puzzle string, one character per cell
+        :return: None
+        '''
         self.start_button.config(state="disabled") # Make it so the start button can't be pressed again
         self.initiated = True # Indicates that the game has started
-        with open('puzzles') as f:
-            lines = f.readlines()
-        self.DisplayBoard(lines)
+        self.Cancel() # Nothing still running for the last game is wanted
+        self.ClearBoard() # Reset Board also comes through here so anything from the last game has to go
+        size = self.columns
+        self.DisplayBoard([puzzle[row*size:row*size + size] for row in range(size)])
+        self.history.Clear() # The givens aren't moves that can be undone
+        self.startTime = time.time()
+        self.elapsedBefore = 0.0
+        self.CalculateMoves()
+
+    def Elapsed(self):
+        '''
+        :return: float: Seconds spent on the current game, including any time before it was saved
+        '''
+        return self.elapsedBefore + time.time() - self.startTime
+
+    def GameState(self):
+        '''
+        :return: savegame.Game: Everything needed to resume the game later
+        '''
+        return savegame.Game(self.givens, self.state.ToString(), tuple(self.pencilMasks),
+                             self.history.actions, self.history.position, self.Elapsed())
+
+    def SaveGame(self, path=SAVE_PATH):
+        '''
+        Saves the game in the compact binary format of savegame.py, which only has room for 9x9 games
+        :param path: File to write
+        :return: None
+        '''
+        if self.geometry.CELLS != 81:
+            self.hint_text.set("Only 9x9 games can be saved")
+            return
+        if self.initiated:
+            self.Cancel("autocomplete") # Finishes off the AutoComplete action so the history is complete
+            savegame.save(path, self.GameState())
+
+    def LoadGame(self, path=SAVE_PATH):
+        '''
+        Resumes a game saved by SaveGame, with its pencil marks, undo history and time
+        :param path: File to read
+        :return: None
+        '''
+        if not os.path.exists(path) or self.geometry.CELLS != 81:
+            return
+        game = savegame.load(path)
+        self.start_button.config(state="disabled")
+        self.initiated = True
+        self.Cancel()
+        self.ClearBoard()
+        self.DisplayBoard([game.givens[row*9:row*9 + 9] for row in range(9)])
+        self.history.replaying = True # Putting the board back isn't a move
+        try:
+            for index in range(81):
+                self.SetDigit(index, int(game.cells[index]))
+                self.SetPencils(index, game.pencils[index])
+        finally:
+            self.history.replaying = False
+        self.history.Restore(game.actions, game.position)
+        self.startTime = time.time()
+        self.elapsedBefore = game.elapsed
         self.CalculateMoves()
 
+    def ClearBoard(self):
+        '''
+        Takes every number, pencil mark and highlight off the board
+        :return: None
+        '''
+        self.canvas.itemconfigure("piece", state="hidden")
+        self.canvas.itemconfigure("pencil", state="hidden")
+        self.ClearHighlight("highlight")
+        self.ClearHighlight("hint")
+        self.ClearHighlight("conflict")
+        self.state.Clear()
+        cells = self.geometry.CELLS
+        self.basicMoves = [0] * cells
+        self.basicPossibles = [self.geometry.ALL] * cells
+        self.moves.Reset()
+        self.lookahead = None
+        self.pencilMasks = array.array(self.pencilMasks.typecode, [0]) * cells
+        self.desiredSquare = []
+        self.falseSquare = []
+        self.validClick = False
+        self.givens = "0" * cells
+
     def DisplayBoard(self, board_list):
         """
         This command is run from the start button of the control panel and starts the game
         :param board_list: string list of a Sudoku board
         :return: None
         """
+        # The puzzle is checked for clashing givens and a unique solution, then the solution, difficulty and technique
+        # trace come out of the analysis cache, all in the background. Until they arrive AutoComplete just solves from scratch
+        self.analysis = None
+        self.validation = None
+        self.hint_text.set("Difficulty: ...")
+        puzzle = "".join(line.strip() for line in board_list)
+        self.givens = puzzle
+        nine = self.geometry.BOX_SIZE == 3
+
+        def Analyse():
+            check = validate.validate(puzzle)
+            if check.verdict != "1": # Only proper puzzles are graded and cached
+                return check, None
+            if nine:
+                return check, self.cache.Lookup(puzzle)
+            # The cache only knows the symmetries of a 9x9 board, the bigger boards are worked out afresh
+            return check, cache.Entry(solver.solve(puzzle), logic.analyse(puzzle))
+        self.RunInBackground("analysis", Analyse, self.AnalysisReady)
         for row, row_string in enumerate(board_list):
             for col, col_string in enumerate(row_string):
                 if col_string == "\n":
                     continue
                 if col_string != "0":
-                    self.AddNum(col_string, self.imageHolder[col_string], row, col)
+                    self.AddNum(col_string, self.Glyph(col_string), row, col)
+
+    def AnalysisReady(self, result):
+        '''
+        Stores the analysis of the puzzle once the cache has it and shows the difficulty, or says what is wrong with the
+        puzzle and marks any givens that clash
+        :param result: (validate.Validation, cache.Entry or None)
+        :return: None
+        '''
+        self.validation, entry = result
+        if entry is None:
+            self.hint_text.set(validate.MESSAGES[self.validation.verdict])
+            for pair in self.validation.conflicts:
+                for index in pair:
+                    self.HighlightSquare(self.geometry.ROW[index], self.geometry.COL[index], "red", "conflict")
+            return
+        self.analysis = entry
+        self.hint_text.set("Difficulty: "+entry.analysis.grade)
 
     def VisualsfromBoard(self):
         """
-        Draw all pieces afresh based on boardarraypieces
+        Draw all pieces afresh based on the board state
         :return: None
         """
-        for row in range(0,8):
-            for col in range(0,8):
-                if self.boardArray.loc[row,col] != 0:
-                    self.AddNum(self.boardArray.loc[row,col].getid(),self.imageHolder[self.boardArray.loc[row,col].getid()[0]],row,col)
+        for row in range(0,self.rows):
+            for col in range(0,self.columns):
+                num = self.state.Get(row,col)
+                if num != 0:
+                    name = engine.SYMBOLS[num - 1]
+                    self.AddNum(name,self.Glyph(name),row,col)
+
+    def SampleCanvas(self):
+        '''
+        Records how many items are on the canvas. Called once each outermost profiled call (PlacePiece, refresh and so
+        on) is done rather than after the calls it makes, so counting the items doesn't slow down what is being timed
+        :return: None
+        '''
+        if hasattr(self, "canvas"):
+            self.profiler.Gauge("canvas items", len(self.canvas.find_all()))
+
+    def ShowStats(self):
+        '''
+        Opens a window with the call counts and latencies collected so far
+        :return: None
+        '''
+        window = tk.Toplevel(self)
+        window.title("Stats")
+        text = tk.Text(window, width=64, height=14, font=("Courier",11))
+        text.pack(side="top", fill="both", expand=True)
+
+        def Fill():
+            text.delete("1.0", "end")
+            text.insert("end", self.profiler.Report())
+        Fill()
+        tk.Button(window, text="Refresh", command=Fill).pack(side="left")
+        tk.Button(window, text="Save", command=self.DumpStats).pack(side="left")
+
+    def DumpStats(self, path=None):
+        '''
+        Writes the collected stats to a JSON file
+        :param path: Where to write them, defaults to SUDOKU_PROFILE_FILE or sudoku_profile.json
+        :return: str: The file written
+        '''
+        path = path or os.environ.get("SUDOKU_PROFILE_FILE") or "sudoku_profile.json"
+        self.profiler.Dump(path)
+        return path
 
     def Screenshot(self):
         '''
@@ -540,23 +1214,43 @@ class GameBoard(tk.Frame):
         xsize = int((event.width-1) / self.columns)
         ysize = int((event.height-1) / self.rows)
         offset = self.top_offset
-        self.size = min(xsize, ysize)
-        self.canvas.delete("square")
-        self.canvas.delete("big_square")
+        size = min(xsize, ysize)
+        if size == self.size and self.squareItems: # Nothing has moved
+            return
+        self.size = size
         color = self.color
+        first = not self.squareItems # The squares are made on the first call and only moved after that
         for row in range(self.rows):
             for col in range(self.columns):
                 x1 = (col * self.size) + offset
                 y1 = (row * self.size) + offset
                 x2 = x1 + self.size
                 y2 = y1 + self.size
-                self.canvas.create_rectangle(x1, y1, x2, y2, outline="black", fill=color, tags="square")
-        for row in range(int(self.rows/3)):
-            for col in range(int(self.rows/3)):
-                x1 = (col * self.size * 3) + offset
-                y1 = (row * self.size * 3) + offset
-                x2 = x1 + self.size * 3
-                y2 = y1 + self.size * 3
-                self.canvas.create_rectangle(x1, y1, x2, y2, outline="black", width=4, tags="big_square")
+                if first:
+                    self.squareItems.append(self.canvas.create_rectangle(x1, y1, x2, y2, outline="black", fill=color, tags="square"))
+                else:
+                    self.canvas.coords(self.squareItems[row*self.columns + col], x1, y1, x2, y2)
+        n = self.geometry.BOX_SIZE # Squares along a side of each box
+        for row in range(n):
+            for col in range(n):
+                x1 = (col * self.size * n) + offset
+                y1 = (row * self.size * n) + offset
+                x2 = x1 + self.size * n
+                y2 = y1 + self.size * n
+                if first:
+                    self.bigSquareItems.append(self.canvas.create_rectangle(x1, y1, x2, y2, outline="black", width=4, tags="big_square"))
+                else:
+                    self.canvas.coords(self.bigSquareItems[row*n + col], x1, y1, x2, y2)
+        # The digit and pencil slots follow the new square size
+        size = self.geometry.SIZE
+        for index in range(self.geometry.CELLS):
+            row = self.geometry.ROW[index]
+            col = self.geometry.COL[index]
+            self.canvas.coords(self.digitSlots[index], *self.CellCentre(row, col))
+            for num in range(1, size + 1):
+                self.canvas.coords(self.pencilSlots[index*size + num-1], *self.PencilCentre(row, col, num))
+        if not self.images: # Text is sized in pixels so it has to follow the squares too
+            self.canvas.itemconfigure("piece", font=self.Font(False))
+            self.canvas.itemconfigure("pencil", font=self.Font(True))
         self.canvas.tag_raise("big_square")
-        self.canvas.tag_lower("square")
\ No newline at end of file
+        self.canvas.tag_lower("square")
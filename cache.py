@@ -0,0 +1,265 @@
+"""
+Persistent cache of puzzle analyses (solution, difficulty and technique trace).
+Entries are keyed by a canonical form of the puzzle that is the same for every puzzle that can be turned into it by
+relabelling the digits, permuting rows within a band, bands, columns within a stack, stacks, or transposing. Equivalent
+puzzles therefore share an entry; the stored analysis is in canonical coordinates and is mapped back onto the puzzle
+that was asked for.
+A small in-memory LRU sits in front of an SQLite file which is trimmed back to a maximum number of entries, dropping
+the least recently used first.
+"""
+import collections
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import engine
+import logic
+import solver
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "analysis_cache.sqlite")
+
+# solution: 81 digit solution of the puzzle (None if it has none)
+# analysis: logic.Analysis of the puzzle
+Entry = collections.namedtuple("Entry", "solution analysis")
+
+# A canonical transformation. transpose: bool, rows/cols: the source row/column for each canonical row/column,
+# labels: dict of original digit -> canonical digit
+Transform = collections.namedtuple("Transform", "transpose rows cols labels")
+
+LINE_ORDERS = tuple(itertools.permutations(range(3))) # The six ways to order three rows/columns/bands/stacks
+# 9 bits -> every 9th bit, so each row of a column lands in the 9-bit slot of that row of the whole grid
+SPREAD = tuple(sum(((value >> (8 - k)) & 1) << (9 * (8 - k)) for k in range(9)) for value in range(512))
+
+
+def _row_orders():
+    '''
+    Every row order allowed by the band structure (bands in any order, rows within each band in any order)
+    :return: list of tuples of 9 source rows
+    '''
+    orders = []
+    for bands in LINE_ORDERS:
+        for p0 in LINE_ORDERS:
+            for p1 in LINE_ORDERS:
+                for p2 in LINE_ORDERS:
+                    orders.append(tuple(bands[b] * 3 + p[k] for b, p in zip(range(3), (p0, p1, p2)) for k in range(3)))
+    return orders
+
+
+ROW_ORDERS = _row_orders() # 1296 of them
+
+
+def canonical(grid):
+    '''
+    Works out the canonical form of a puzzle.
+    The form is the minimum over every row order (and transposition) of the givens pattern read row by row, with blanks
+    sorting first. For a fixed row order the best columns come from sorting the columns of each stack and then the
+    stacks themselves, so only the row orders have to be enumerated. Ties are broken on the digits after relabelling them
+    in order of first appearance.
+    :param grid: Puzzle in any format accepted by solver.parse_grid
+    :return: (str, Transform): The canonical 81 digit puzzle and the transformation that produces it
+    '''
+    cells = solver.parse_grid(grid)
+    sources = [(False, [cells[r * 9:r * 9 + 9] for r in range(9)])]
+    sources.append((True, [[cells[r * 9 + c] for r in range(9)] for c in range(9)]))
+
+    best_mask = None
+    tied = [] # (transpose, rows, column orders giving the best mask)
+    for transpose, rows in sources:
+        givens = [[1 if value else 0 for value in row] for row in rows]
+        for order in ROW_ORDERS:
+            # Column c read top to bottom in this row order as a 9-bit number with the top row as the highest bit
+            vectors = [0] * 9
+            for r in order:
+                bits = givens[r]
+                for c in range(9):
+                    vectors[c] = (vectors[c] << 1) | bits[c]
+            stacks = []
+            for s in range(3):
+                cols = sorted(range(s * 3, s * 3 + 3), key=vectors.__getitem__)
+                # The stack read row by row, its three bits of each row in the low three bits of that row's slot
+                key = (SPREAD[vectors[cols[0]]] << 2) | (SPREAD[vectors[cols[1]]] << 1) | SPREAD[vectors[cols[2]]]
+                stacks.append((key, cols))
+            stacks.sort()
+            mask = (stacks[0][0] << 6) | (stacks[1][0] << 3) | stacks[2][0] # Row by row pattern of the givens, 81 bits
+            if best_mask is None or mask < best_mask:
+                best_mask = mask
+                tied = []
+            if mask == best_mask:
+                tied.append((transpose, rows, order, vectors, stacks))
+
+    best = None
+    for transpose, rows, order, vectors, stacks in tied:
+        for cols in _column_orders(vectors, stacks):
+            labels = {}
+            digits = []
+            for r in order:
+                row = rows[r]
+                for c in cols:
+                    value = row[c]
+                    if value and value not in labels:
+                        labels[value] = len(labels) + 1
+                    digits.append(labels.get(value, 0))
+            if best is None or digits < best[0]:
+                best = (digits, Transform(transpose, order, cols, labels))
+    digits, transform = best
+    labels = dict(transform.labels)
+    for num in range(1, 10): # A digit missing from the givens still needs a label so solutions can be mapped
+        if num not in labels:
+            labels[num] = len(labels) + 1
+    return "".join(map(str, digits)), transform._replace(labels=labels)
+
+
+def _column_orders(vectors, stacks):
+    '''
+    Every column order that gives the same givens pattern as the sorted one, found by permuting identical columns
+    within a stack and stacks with identical keys
+    :return: Generator of tuples of 9 source columns
+    '''
+    stack_options = []
+    for key, cols in stacks:
+        groups = [list(group) for value, group in itertools.groupby(cols, key=vectors.__getitem__)]
+        options = [tuple(itertools.chain(*choice)) for choice in itertools.product(*[itertools.permutations(g) for g in groups])]
+        stack_options.append((key, options))
+    key_groups = [list(group) for key, group in itertools.groupby(stack_options, key=lambda item: item[0])]
+    arrangements = [list(itertools.permutations(group)) for group in key_groups]
+    for choice in itertools.product(*arrangements):
+        ordered = [options for group in choice for key, options in group]
+        for cols in itertools.product(*ordered):
+            yield tuple(itertools.chain(*cols))
+
+
+def to_original(transform, index):
+    '''
+    Maps a canonical cell index back onto the puzzle the transform was made from
+    :param transform: Transform from canonical
+    :param index: Cell index in the canonical grid
+    :return: int: Cell index in the original grid
+    '''
+    r = transform.rows[engine.ROW[index]]
+    c = transform.cols[engine.COL[index]]
+    if transform.transpose:
+        r, c = c, r
+    return r * 9 + c
+
+
+def map_grid(transform, canonical_grid):
+    '''
+    Turns a grid in canonical coordinates (such as a cached solution) back into the coordinates and digits of the
+    original puzzle
+    :return: str: 81 digits
+    '''
+    unlabel = {canon: num for num, canon in transform.labels.items()}
+    cells = [0] * 81
+    for index, value in enumerate(canonical_grid):
+        cells[to_original(transform, index)] = unlabel.get(int(value), 0)
+    return "".join(map(str, cells))
+
+
+def map_analysis(transform, analysis):
+    '''
+    Turns a canonical analysis back into the coordinates and digits of the original puzzle
+    :return: logic.Analysis
+    '''
+    unlabel = {canon: num for num, canon in transform.labels.items()}
+    cell = lambda index: to_original(transform, index)
+    steps = [
+        logic.Step(step.technique,
+                   tuple((cell(i), unlabel[num]) for i, num in step.placements),
+                   tuple((cell(i), unlabel[num]) for i, num in step.eliminations),
+                   tuple(cell(i) for i in step.cells))
+        for step in analysis.steps
+    ]
+    return analysis._replace(grid=map_grid(transform, analysis.grid), steps=steps)
+
+
+class AnalysisCache(object):
+    """
+    Looks up (or works out and stores) the solution and logical analysis of a puzzle
+    """
+    def __init__(self, path=DEFAULT_PATH, memory_size=256, disk_size=200000):
+        '''
+        :param path: SQLite file to keep the entries in, None keeps everything in memory only
+        :param memory_size: Number of puzzles held in the in-memory LRU
+        :param disk_size: Maximum number of entries kept in the file before the least recently used are dropped
+        '''
+        self.memory = collections.OrderedDict() # puzzle string -> Entry, already mapped onto that puzzle
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.lock = threading.Lock() # The GUI may ask from a worker thread
+        self.connection = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS analysis (key TEXT PRIMARY KEY, solution TEXT, solved INTEGER, grid TEXT, "
+            "score INTEGER, grade TEXT, trace TEXT, used REAL)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS analysis_used ON analysis (used)")
+        self.connection.commit()
+        self.count = self.connection.execute("SELECT COUNT(*) FROM analysis").fetchone()[0] # Entries in the file
+
+    def Lookup(self, grid):
+        '''
+        Returns the cached entry for a puzzle, working it out and storing it first if necessary
+        :param grid: Puzzle in any format accepted by solver.parse_grid
+        :return: Entry
+        '''
+        puzzle = "".join(map(str, solver.parse_grid(grid)))
+        with self.lock:
+            entry = self.memory.get(puzzle)
+            if entry is not None:
+                self.memory.move_to_end(puzzle)
+                return entry
+        key, transform = canonical(puzzle)
+        with self.lock:
+            stored = self.Read(key)
+        if stored is None:
+            stored = Entry(solver.solve(key), logic.analyse(key))
+            with self.lock:
+                self.Write(key, stored)
+        solution = stored.solution and map_grid(transform, stored.solution)
+        entry = Entry(solution, map_analysis(transform, stored.analysis))
+        with self.lock:
+            self.memory[puzzle] = entry
+            while len(self.memory) > self.memory_size:
+                self.memory.popitem(last=False)
+        return entry
+
+    def Read(self, key):
+        '''
+        :param key: Canonical puzzle
+        :return: Entry in canonical coordinates or None if it isn't stored
+        '''
+        row = self.connection.execute(
+            "SELECT solution, solved, grid, score, grade, trace FROM analysis WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self.connection.execute("UPDATE analysis SET used = ? WHERE key = ?", (time.time(), key))
+        self.connection.commit()
+        solution, solved, grid, score, grade, trace = row
+        steps = [logic.Step(technique, tuple(map(tuple, placements)), tuple(map(tuple, eliminations)), tuple(cells))
+                 for technique, placements, eliminations, cells in json.loads(trace)]
+        return Entry(solution, logic.Analysis(bool(solved), grid, steps, score, grade))
+
+    def Write(self, key, entry):
+        '''
+        Stores an entry in canonical coordinates and trims the file back to disk_size entries
+        :return: None
+        '''
+        analysis = entry.analysis
+        trace = json.dumps([[step.technique, step.placements, step.eliminations, step.cells] for step in analysis.steps])
+        self.connection.execute(
+            "INSERT OR REPLACE INTO analysis VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, entry.solution, int(analysis.solved), analysis.grid, analysis.score, analysis.grade, trace, time.time()))
+        # Counted as a new entry, which it almost always is. A replaced one makes the count too high, so it is only
+        # checked against the file once it goes over the limit rather than on every insert
+        self.count += 1
+        if self.count > self.disk_size:
+            self.count = self.connection.execute("SELECT COUNT(*) FROM analysis").fetchone()[0]
+            if self.count > self.disk_size:
+                self.connection.execute(
+                    "DELETE FROM analysis WHERE key IN (SELECT key FROM analysis ORDER BY used LIMIT ?)",
+                    (self.count - self.disk_size,))
+                self.count = self.disk_size
+        self.connection.commit()
+
+    def Close(self):
+        self.connection.close()
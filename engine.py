@@ -0,0 +1,317 @@
+import sys
+
+SYMBOLS = "123456789ABCDEFGHIJKLMNOP" # How digits 1-25 are written, boards bigger than 9x9 carry on into letters
+VALUES = dict([(ch, num + 1) for num, ch in enumerate(SYMBOLS)] + [(ch.lower(), num + 1) for num, ch in enumerate(SYMBOLS[9:], 9)]
+              + [("0", 0), (".", 0)]) # Character -> digit (0 = empty)
+
+
+class Geometry(object):
+    """
+    Lookup tables for a board made of n x n boxes, built once per box size. n = 3 is the normal 9x9 board while 4 and 5
+    give 16x16 and 25x25 boards. Cells are numbered row*SIZE + col and digit masks have bit 0 = digit 1.
+    Everything that needs to know which row, column, box, unit or peers a cell has looks it up here rather than working
+    it out with divisions on every call. The tables are tuples, which index faster than bytes or array.array in CPython
+    and share the small int objects so they stay small.
+    """
+    def __init__(self, n):
+        '''
+        :param n: Width of a box in cells
+        '''
+        size = n * n
+        self.BOX_SIZE = n
+        self.SIZE = size # Cells along a side, also the number of digits
+        self.CELLS = size * size
+        self.ALL = (1 << size) - 1 # Every digit is still possible
+        self.ROW = tuple(i // size for i in range(self.CELLS)) # Row of each cell
+        self.COL = tuple(i % size for i in range(self.CELLS)) # Column of each cell
+        self.BOX = tuple((i // (size * n)) * n + (i % size) // n for i in range(self.CELLS)) # Box of each cell
+        # Name of each cell, "row_col", which is also its tag on the GameBoard canvas. Interned so tag lookups compare
+        # the same string object
+        self.NAME = tuple(sys.intern("%d_%d" % (self.ROW[i], self.COL[i])) for i in range(self.CELLS))
+        self.UNITS = tuple(
+            [tuple(r * size + c for c in range(size)) for r in range(size)] +
+            [tuple(r * size + c for r in range(size)) for c in range(size)] +
+            [tuple(i for i in range(self.CELLS) if self.BOX[i] == b) for b in range(size)]
+        ) # The rows, then columns, then boxes as tuples of cell indices
+        self.PEERS = tuple(
+            tuple(sorted(set(self.UNITS[self.ROW[i]] + self.UNITS[size + self.COL[i]] + self.UNITS[2 * size + self.BOX[i]]) - {i}))
+            for i in range(self.CELLS)
+        ) # The cells sharing a row, column or box with each cell (20 on a 9x9 board)
+        if size <= 9: # Small enough to look the answers up
+            self.BIT_COUNT = tuple(bin(m).count("1") for m in range(1 << size)) # Number of digits in a mask
+            self.DIGITS_OF = tuple(tuple(num for num in range(1, size + 1) if m >> (num - 1) & 1) for m in range(1 << size))
+        else: # 2^16 or 2^25 entries would be too many, these work them out when asked
+            self.BIT_COUNT = _BitCount()
+            self.DIGITS_OF = _DigitsOf()
+
+
+class _BitCount(object):
+    def __getitem__(self, mask):
+        return bin(mask).count("1")
+
+
+class _DigitsOf(object):
+    def __getitem__(self, mask):
+        return tuple(num + 1 for num in range(mask.bit_length()) if mask >> num & 1)
+
+
+_geometries = {}
+
+
+def geometry(n=3):
+    '''
+    :param n: Width of a box in cells
+    :return: Geometry: The shared tables for that box size
+    '''
+    found = _geometries.get(n)
+    if found is None:
+        if not 2 <= n <= 5:
+            raise ValueError("Boxes must be 2 to 5 cells wide, got " + str(n))
+        found = _geometries[n] = Geometry(n)
+    return found
+
+
+def geometry_for(cells):
+    '''
+    :param cells: Number of cells on a board, e.g. 81 or 256
+    :return: Geometry of the board with that many cells
+    '''
+    for n in range(2, 6):
+        if n ** 4 == cells:
+            return geometry(n)
+    raise ValueError("A Sudoku grid needs 16, 81, 256 or 625 cells, got " + str(cells))
+
+
+# The normal 9x9 board, which is what most of the code works with
+GEOMETRY = geometry(3)
+ALL = GEOMETRY.ALL
+ROW = GEOMETRY.ROW
+COL = GEOMETRY.COL
+BOX = GEOMETRY.BOX
+UNITS = GEOMETRY.UNITS
+PEERS = GEOMETRY.PEERS
+NAME = GEOMETRY.NAME
+
+# Setting this to True makes every Place/Remove compare the incrementally maintained candidates against a full
+# recalculation. It is far too slow to leave on but is handy when changing anything in here.
+CHECK_CANDIDATES = False
+
+
+class BoardState(object):
+    """
+    GUI independent description of a Sudoku board.
+    The cells are held in a flat list (index = row*SIZE + col, SIZE = 9 on a normal board) and the digits used in every
+    row, column and box are held as bit masks (bit 0 = digit 1 ... bit 8 = digit 9) so that placing, removing and asking
+    for the candidates of a cell are all O(1) operations. The player is free to put the same digit twice in a unit, so
+    alongside the masks every unit counts how many of each digit it holds and a bit is only cleared when the last one goes.
+    The candidate mask of every cell is also kept up to date as digits come and go, which only ever touches the cell and
+    its peers (20 on a 9x9 board) rather than the whole board.
+    """
+    __slots__ = ("geometry", "cells", "rowMask", "colMask", "boxMask", "rowCount", "colCount", "boxCount", "candidates", "filled")
+
+    def __init__(self, grid=None, box_size=None):
+        '''
+        Creates an empty board, or a board holding the puzzle described by grid
+        :param grid: Optional string (or iterable of ints) of every cell with 0 or . for empty cells
+        :param box_size: Width of a box, 3 for 9x9, 4 for 16x16, 5 for 25x25. None works it out from grid (or uses 3)
+        '''
+        if box_size is None:
+            self.geometry = GEOMETRY if grid is None else geometry_for(len(grid))
+        else:
+            self.geometry = geometry(box_size)
+        size = self.geometry.SIZE
+        self.cells = [0] * self.geometry.CELLS # The digit in each cell (0 = empty)
+        self.rowMask = [0] * size # Digits already used in each row
+        self.colMask = [0] * size # Digits already used in each column
+        self.boxMask = [0] * size # Digits already used in each box
+        self.rowCount = [0] * (size * size) # How many of each digit every row holds, at row*SIZE + num-1
+        self.colCount = [0] * (size * size) # The same for the columns
+        self.boxCount = [0] * (size * size) # And the boxes
+        self.candidates = [self.geometry.ALL] * self.geometry.CELLS # Digits that could legally go into each cell (0 once it is filled)
+        self.filled = 0 # Number of non-empty cells, makes the full board check free
+        if grid is not None:
+            self.Load(grid)
+
+    def Load(self, grid):
+        '''
+        Clears the board and places every given in grid
+        :param grid: String (or iterable of ints) of every cell with 0 or . for empty cells
+        :return: None
+        '''
+        self.Clear()
+        ROW = self.geometry.ROW
+        COL = self.geometry.COL
+        for index, value in enumerate(grid):
+            if value in (".", "0", 0):
+                continue
+            self.Place(ROW[index], COL[index], VALUES[value] if isinstance(value, str) else int(value))
+
+    def Clear(self):
+        '''
+        Empties every cell
+        :return: None
+        '''
+        for i in range(self.geometry.CELLS):
+            self.cells[i] = 0
+            self.candidates[i] = self.geometry.ALL
+        for i in range(self.geometry.SIZE):
+            self.rowMask[i] = 0
+            self.colMask[i] = 0
+            self.boxMask[i] = 0
+        for i in range(self.geometry.SIZE * self.geometry.SIZE):
+            self.rowCount[i] = 0
+            self.colCount[i] = 0
+            self.boxCount[i] = 0
+        self.filled = 0
+
+    def Get(self, row, col):
+        '''
+        :param row: Row on board
+        :param col: Column on board
+        :return: int: The digit in the cell or 0 if it is empty
+        '''
+        return self.cells[row * self.geometry.SIZE + col]
+
+    def Place(self, row, col, num):
+        '''
+        Puts a digit into an empty cell and marks it as used in the row, column and box
+        :param row: Row on board
+        :param col: Column on board
+        :param num: Digit 1-9 (up to 25 on bigger boards)
+        :return: None
+        '''
+        geometry = self.geometry
+        index = row * geometry.SIZE + col
+        if self.cells[index]: # Overwriting a cell has to release the old digit first
+            self.Remove(row, col)
+        bit = 1 << (num - 1)
+        box = geometry.BOX[index]
+        self.cells[index] = num
+        self.rowMask[row] |= bit
+        self.colMask[col] |= bit
+        self.boxMask[box] |= bit
+        digit = num - 1
+        self.rowCount[row * geometry.SIZE + digit] += 1
+        self.colCount[col * geometry.SIZE + digit] += 1
+        self.boxCount[box * geometry.SIZE + digit] += 1
+        self.filled += 1
+        # The cell itself is no longer open and none of its peers can take this digit any more
+        self.candidates[index] = 0
+        clear = ~bit
+        candidates = self.candidates
+        for peer in geometry.PEERS[index]:
+            candidates[peer] &= clear
+        if CHECK_CANDIDATES:
+            assert candidates == self.RecomputeCandidates(), "Candidates out of step after placing " + str(num)
+
+    def Remove(self, row, col):
+        '''
+        Empties a cell and releases its digit from the row, column and box
+        :param row: Row on board
+        :param col: Column on board
+        :return: int: The digit that was removed (0 if the cell was already empty)
+        '''
+        geometry = self.geometry
+        index = row * geometry.SIZE + col
+        num = self.cells[index]
+        if num:
+            bit = 1 << (num - 1)
+            BOX = geometry.BOX
+            box = BOX[index]
+            self.cells[index] = 0
+            # The digit only leaves a unit's mask when this was the last of it there, a clashing copy keeps it in
+            digit = num - 1
+            size = geometry.SIZE
+            self.rowCount[row * size + digit] -= 1
+            if not self.rowCount[row * size + digit]:
+                self.rowMask[row] &= ~bit
+            self.colCount[col * size + digit] -= 1
+            if not self.colCount[col * size + digit]:
+                self.colMask[col] &= ~bit
+            self.boxCount[box * size + digit] -= 1
+            if not self.boxCount[box * size + digit]:
+                self.boxMask[box] &= ~bit
+            self.filled -= 1
+            # The emptied cell gets all its legal digits back, while a peer only gets this digit back if nothing else
+            # in its own row, column or box is still holding it
+            rows = self.rowMask
+            cols = self.colMask
+            boxes = self.boxMask
+            cells = self.cells
+            candidates = self.candidates
+            ROW = geometry.ROW
+            COL = geometry.COL
+            candidates[index] = geometry.ALL & ~(rows[row] | cols[col] | boxes[BOX[index]])
+            for peer in geometry.PEERS[index]:
+                if not cells[peer] and not (rows[ROW[peer]] | cols[COL[peer]] | boxes[BOX[peer]]) & bit:
+                    candidates[peer] |= bit
+            if CHECK_CANDIDATES:
+                assert candidates == self.RecomputeCandidates(), "Candidates out of step after removing " + str(num)
+        return num
+
+    def CandidateMask(self, row, col):
+        '''
+        :param row: Row on board
+        :param col: Column on board
+        :return: int: Mask of the digits that could legally go into the cell (0 if it is occupied)
+        '''
+        return self.candidates[row * self.geometry.SIZE + col]
+
+    def Candidates(self, row, col):
+        '''
+        :param row: Row on board
+        :param col: Column on board
+        :return: str: The legal digits for the cell in ascending order, e.g. "147"
+        '''
+        return mask_to_string(self.CandidateMask(row, col))
+
+    def RecomputeCandidates(self):
+        '''
+        Works out the candidates of every cell from scratch, straight from the digits on the board rather than the masks,
+        so that it can check the incremental version
+        :return: list: The candidate mask of every cell
+        '''
+        g = self.geometry
+        cells = self.cells
+        result = [0] * g.CELLS
+        for i in range(g.CELLS):
+            if not cells[i]:
+                used = 0
+                for peer in g.PEERS[i]:
+                    if cells[peer]:
+                        used |= 1 << (cells[peer] - 1)
+                result[i] = g.ALL & ~used
+        return result
+
+    def IsFull(self):
+        '''
+        :return: bool: True when every cell holds a digit
+        '''
+        return self.filled == self.geometry.CELLS
+
+    def ToString(self):
+        '''
+        :return: str: The board in the one character per cell format used by the puzzles file (0 for empty)
+        '''
+        return "".join(SYMBOLS[num - 1] if num else "0" for num in self.cells)
+
+
+def mask_to_string(mask):
+    '''
+    Converts a digit mask into the ascending digit string used throughout the GUI
+    :param mask: int: Bit 0 = digit 1 ... bit 8 = digit 9 (and on to bit 24 = P on a 25x25 board)
+    :return: str: e.g. 0b1001001 -> "147"
+    '''
+    return "".join(SYMBOLS[num] for num in range(mask.bit_length()) if mask >> num & 1)
+
+
+def string_to_mask(digits):
+    '''
+    The reverse of mask_to_string
+    :param digits: str: e.g. "147" (any order)
+    :return: int: Digit mask
+    '''
+    mask = 0
+    for num in digits:
+        mask |= 1 << (VALUES[num] - 1)
+    return mask
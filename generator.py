@@ -0,0 +1,178 @@
+"""
+Generates new puzzles.
+A random completed grid is built by the solver and then givens are taken away one at a time in a random order, putting
+each one back if the puzzle stops having a unique solution. Every cell is tried once, so what is left is minimal (no
+given can be removed). The logical solver then grades the puzzle and it is kept if it falls in the wanted grades.
+Minimal puzzles mostly come out Easy or beyond the logical solver, so asking for Hard or Expert only can take many
+attempts per puzzle. Each puzzle gets a limited number of attempts and the run says how many fell short.
+Run it from the command line to fill a pool file in parallel, e.g.
+    python generator.py -n 5000 --grade Hard --grade Expert -o puzzle_pool.txt
+and the GameBoard will deal puzzles out of that pool instead of always replaying the puzzles file.
+"""
+import argparse
+import concurrent.futures
+import os
+import random
+import sys
+import time
+import logic
+import solver
+
+DEFAULT_POOL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "puzzle_pool.txt")
+
+
+def minimal_puzzle(rng, box_size=3):
+    '''
+    Makes a random minimal puzzle with a unique solution
+    :param rng: random.Random to draw from
+    :param box_size: 3 for a 9x9 puzzle, 4 for 16x16 (seconds rather than milliseconds) or 5 for 25x25 (far longer still)
+    :return: str: 81 digit puzzle with 0 for the empty cells
+    '''
+    cells = list(solver.random_solution(rng, box_size))
+    order = list(range(len(cells)))
+    rng.shuffle(order)
+    for i in order:
+        value = cells[i]
+        cells[i] = "0"
+        if solver.count_solutions("".join(cells), 2) != 1: # This given is needed
+            cells[i] = value
+    return "".join(cells)
+
+
+def generate(grades=None, rng=None, attempts=1000):
+    '''
+    Makes a puzzle in one of the wanted grades
+    :param grades: Collection of grade names from logic.GRADES (or "Unsolved" for beyond the logical solver), None for any
+    :param rng: random.Random to draw from
+    :param attempts: How many puzzles to try before giving up
+    :return: (str, logic.Analysis) or None if nothing in the grades turned up
+    '''
+    rng = rng or random.Random()
+    for attempt in range(attempts):
+        puzzle = minimal_puzzle(rng)
+        analysis = logic.analyse(puzzle)
+        if grades is None or analysis.grade in grades:
+            return puzzle, analysis
+    return None
+
+
+def GenerateChunk(count, grades, seed, attempts=1000):
+    '''
+    Runs in the worker processes and makes a batch of puzzles
+    :param count: Number of puzzles to make
+    :param grades: Wanted grades or None
+    :param seed: Seed for this batch so every worker makes different puzzles
+    :param attempts: Passed to generate for each puzzle
+    :return: list: "puzzle<TAB>grade<TAB>score" lines, fewer than count if generate gave up on some
+    '''
+    rng = random.Random(seed)
+    lines = []
+    for n in range(count):
+        found = generate(grades, rng, attempts)
+        if found is not None:
+            puzzle, analysis = found
+            lines.append("%s\t%s\t%d\n" % (puzzle, analysis.grade, analysis.score))
+    return lines
+
+
+class PuzzlePool(object):
+    """
+    Deals out puzzles from a pool file made by this module, one per line, and remembers where it is up to. The place is
+    kept in a file next to the pool so a puzzle isn't dealt again the next time the game is started.
+    """
+    def __init__(self, path=DEFAULT_POOL):
+        '''
+        :param path: Pool file, it doesn't have to exist
+        '''
+        self.path = path
+        self.offset_path = path + ".offset"
+        self.offset = self.LoadOffset() # Byte offset of the next unread line
+
+    def LoadOffset(self):
+        '''
+        :return: int: The offset saved by an earlier game, 0 if there isn't one
+        '''
+        try:
+            with open(self.offset_path) as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError): # Missing or damaged, so the pool is started again from the top
+            return 0
+
+    def SaveOffset(self):
+        '''
+        :return: None
+        '''
+        try:
+            with open(self.offset_path, "w") as f:
+                f.write("%d\n" % self.offset)
+        except OSError: # The game carries on, the puzzle may just be dealt again next time
+            pass
+
+    def Next(self):
+        '''
+        :return: str: The next 81 digit puzzle, or None when the pool is missing or used up
+        '''
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            if self.offset > os.fstat(f.fileno()).st_size: # The pool has been made again since the offset was saved
+                self.offset = 0
+            f.seek(self.offset)
+            while True:
+                line = f.readline()
+                if not line:
+                    self.SaveOffset()
+                    return None
+                self.offset = f.tell()
+                puzzle = line.split(b"\t")[0].strip().decode("ascii")
+                if len(puzzle) == 81:
+                    self.SaveOffset()
+                    return puzzle.replace(".", "0")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate minimal Sudoku puzzles with a unique solution")
+    parser.add_argument("-n", "--count", type=int, default=100, help="number of puzzles to make (default: 100)")
+    parser.add_argument("-g", "--grade", action="append", help="only keep puzzles of this grade, can be repeated "
+                        "(" + ", ".join(name for limit, name in logic.GRADES) + ", Unsolved)")
+    parser.add_argument("-o", "--output", default=DEFAULT_POOL, help="file to append the puzzles to (default: the pool)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: all cores)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=20, help="puzzles made per task (default: 20)")
+    parser.add_argument("-s", "--seed", type=int, help="seed for reproducible output")
+    parser.add_argument("-a", "--attempts", type=int, default=1000, help="puzzles tried for each one kept before giving "
+                        "up on it (default: 1000)")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    if args.attempts < 1:
+        parser.error("--attempts must be at least 1")
+    known = [name for limit, name in logic.GRADES] + ["Unsolved"]
+    for grade in args.grade or ():
+        if grade not in known: # A typo would otherwise use up every attempt on every puzzle
+            parser.error("unknown grade %r, choose from %s" % (grade, ", ".join(known)))
+
+    seeds = random.Random(args.seed)
+    chunks = [min(args.chunk_size, args.count - start) for start in range(0, args.count, args.chunk_size)]
+    grades = set(args.grade) if args.grade else None
+    start = time.perf_counter()
+    made = 0
+    with open(args.output, "a") as out:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers) as pool:
+            futures = [pool.submit(GenerateChunk, count, grades, seeds.getrandbits(64), args.attempts) for count in chunks]
+            for future in concurrent.futures.as_completed(futures): # Written as soon as each batch is done
+                lines = future.result()
+                out.writelines(lines)
+                out.flush()
+                made += len(lines)
+    elapsed = time.perf_counter() - start
+    print("Made %d of %d puzzles in %.2fs (%.0f per minute)" % (made, args.count, elapsed, made * 60 / max(elapsed, 1e-9)),
+          file=sys.stderr)
+    if made < args.count:
+        print("%d puzzles were given up on after %d attempts each without one in the wanted grades, try more --attempts"
+              % (args.count - made, args.attempts), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,158 @@
+"""
+The queue of moves that can be deduced straight away, kept up to date as the board changes.
+Rather than searching the board when the player asks for a hint, the GameBoard tells the MoveQueue about every cell
+whose candidates change (the placed or erased cell and its peers) and the queue patches its bookkeeping for just those
+cells: which cells are down to one candidate (naked singles) and, for every row, column and box, how many places each
+digit has left (a count of 1 is a hidden single). Asking for the next move is then a dictionary lookup. Moves come out
+oldest first, as logic.Step tuples so they can be shown like any step of the logical solver.
+"""
+import logic
+
+_cell_units = {} # box size -> units of each cell
+
+
+def cell_units(geometry):
+    '''
+    :param geometry: engine.Geometry
+    :return: tuple: The numbers (positions in geometry.UNITS) of the row, column and box of each cell
+    '''
+    units = _cell_units.get(geometry.BOX_SIZE)
+    if units is None:
+        size = geometry.SIZE
+        units = tuple((geometry.ROW[i], size + geometry.COL[i], 2 * size + geometry.BOX[i]) for i in range(geometry.CELLS))
+        _cell_units[geometry.BOX_SIZE] = units
+    return units
+
+
+class MoveQueue(object):
+    """
+    Naked and hidden singles of a board, patched a cell at a time
+    """
+    def __init__(self, state):
+        '''
+        :param state: engine.BoardState to follow, its candidates are read when a cell is synced
+        '''
+        self.state = state
+        self.geometry = state.geometry
+        self.units = cell_units(self.geometry)
+        self.Reset()
+
+    def Reset(self):
+        '''
+        Rebuilds everything from the board, for a new game or after the board has been cleared
+        :return: None
+        '''
+        geometry = self.geometry
+        size = geometry.SIZE
+        candidates = self.state.candidates
+        cells = self.state.cells
+        self.candidates = list(candidates) # The candidates as last synced
+        self.places = places = [0] * (len(geometry.UNITS) * size) # unit*SIZE + digit-1 -> cells of the unit that can take the digit
+        # Dicts are used as ordered sets, so the moves that have been waiting longest come out first
+        self.naked = {} # Cells with a single candidate
+        self.dead = {} # Empty cells with no candidates at all, the board can't be solved while there are any
+        for index in range(geometry.CELLS):
+            mask = candidates[index]
+            if not mask:
+                if not cells[index]:
+                    self.dead[index] = None
+                continue
+            if not mask & (mask - 1):
+                self.naked[index] = None
+            for unit in self.units[index]:
+                base = unit * size - 1
+                while mask:
+                    bit = mask & -mask
+                    mask ^= bit
+                    places[base + bit.bit_length()] += 1
+                mask = candidates[index]
+        # The counts are only looked at once they are all in, rather than after every cell as Sync would
+        self.hidden = dict.fromkeys(key for key, count in enumerate(places) if count == 1) # unit*SIZE + digit-1 with a single place left
+
+    def Sync(self, index):
+        '''
+        Brings one cell up to date with the board
+        :param index: Cell whose candidates may have changed
+        :return: None
+        '''
+        old = self.candidates[index]
+        mask = self.state.candidates[index]
+        if not mask and not self.state.cells[index]:
+            self.dead[index] = None
+        else:
+            self.dead.pop(index, None)
+        if old == mask:
+            return
+        self.candidates[index] = mask
+        if mask and not mask & (mask - 1):
+            self.naked.setdefault(index, None)
+        else:
+            self.naked.pop(index, None)
+        size = self.geometry.SIZE
+        places = self.places
+        hidden = self.hidden
+        changed = old ^ mask
+        while changed: # Only the digits that came or went move the counts
+            bit = changed & -changed
+            changed ^= bit
+            step = 1 if mask & bit else -1
+            digit = bit.bit_length() - 1
+            for unit in self.units[index]:
+                key = unit * size + digit
+                places[key] += step
+                if places[key] == 1:
+                    hidden.setdefault(key, None)
+                else:
+                    hidden.pop(key, None)
+
+    def SyncAround(self, index):
+        '''
+        Brings a cell and all of its peers up to date, which covers every candidate a move can change
+        :param index: The cell a digit was placed in or erased from
+        :return: None
+        '''
+        self.Sync(index)
+        for peer in self.geometry.PEERS[index]:
+            self.Sync(peer)
+
+    def Next(self):
+        '''
+        :return: logic.Step of the oldest naked single, else hidden single, or None if there are neither (or the board
+                 has an empty cell that nothing can go in)
+        '''
+        if self.dead:
+            return None
+        for index in self.naked:
+            return logic.Step("Naked Single", ((index, self.candidates[index].bit_length()),), (), (index,))
+        size = self.geometry.SIZE
+        for key in self.hidden:
+            unit = self.geometry.UNITS[key // size]
+            bit = 1 << key % size
+            for index in unit:
+                if self.candidates[index] & bit:
+                    return logic.Step("Hidden Single", ((index, key % size + 1),), (), unit)
+        return None
+
+    def Hidden(self):
+        '''
+        :return: dict: cell -> digit of every hidden single (a naked single can be one too)
+        '''
+        cells = {}
+        size = self.geometry.SIZE
+        for key in self.hidden:
+            bit = 1 << key % size
+            for index in self.geometry.UNITS[key // size]:
+                if self.candidates[index] & bit:
+                    cells[index] = key % size + 1
+        return cells
+
+    def Moves(self):
+        '''
+        :return: list: Digit each cell can be given by a naked or hidden single, 0 for the others (like GameBoard.basicMoves)
+        '''
+        moves = [0] * self.geometry.CELLS
+        for index in self.naked:
+            moves[index] = self.candidates[index].bit_length()
+        for index, num in self.Hidden().items():
+            moves[index] = num
+        return moves
@@ -0,0 +1,161 @@
+"""
+Undo/redo history for the GameBoard.
+Every change the player makes is logged as a Move: a digit going in or out of a cell, or the pencil marks of a cell
+changing. The moves belonging to one action (e.g. placing a digit also clears that cell's pencil marks) are grouped so
+they are undone together. Undo and redo just step a position through the log, and applying an action only touches the
+cells it names. Every SNAPSHOT_EVERY actions a compact snapshot of the board is kept (81 bytes of digits and 81 9-bit
+pencil masks) so that jumping to any point of a long history restores the nearest snapshot and replays a few actions
+instead of walking the whole log.
+"""
+import array
+import collections
+
+SNAPSHOT_EVERY = 50 # Actions between snapshots
+SNAPSHOT_COST = 10 # Roughly how many actions restoring a snapshot is worth when choosing how to jump
+
+# kind: "digit" or "pencil", index: cell (row*9 + col)
+# before/after: the digit (0 for empty) or the pencil mark mask of that cell either side of the move
+Move = collections.namedtuple("Move", "kind index before after")
+
+# grid: bytes of the 81 digits, pencils: array of 81 9-bit pencil masks (see engine.string_to_mask), more of both on
+# the bigger boards
+Snapshot = collections.namedtuple("Snapshot", "grid pencils")
+
+
+def make_snapshot(cells, pencils):
+    '''
+    :param cells: The 81 digits with 0 for empty
+    :param pencils: The 81 pencil mark masks
+    :return: Snapshot
+    '''
+    return Snapshot(bytes(cells), array.array("H" if max(pencils, default=0) <= 0xFFFF else "L", pencils)) # 25x25 masks need 25 bits
+
+
+class MoveHistory(object):
+    """
+    Log of the actions taken since the puzzle was loaded with a position that undo and redo move back and forth
+    """
+    def __init__(self, snapshot, snapshot_every=SNAPSHOT_EVERY):
+        '''
+        :param snapshot: Function returning a Snapshot of the board as it stands
+        :param snapshot_every: Number of actions between snapshots
+        '''
+        self.snapshot = snapshot
+        self.snapshot_every = snapshot_every
+        self.Clear()
+
+    def Clear(self):
+        '''
+        Forgets everything and takes the board as it stands as the starting point
+        :return: None
+        '''
+        self.actions = [] # Tuples of Moves, one per action
+        self.position = 0 # Number of actions currently applied
+        self.pending = [] # Moves of the action being recorded
+        self.depth = 0 # Nesting of Begin/End
+        self.replaying = False # Moves made while undoing or redoing aren't recorded
+        self.snapshots = {0: self.snapshot()} # Number of actions applied -> Snapshot of the board at that point
+
+    def Restore(self, actions, position):
+        '''
+        Takes over a history saved earlier (see savegame.py), with the board already showing the state at position
+        :param actions: list of tuples of Moves
+        :param position: Number of those actions that are applied
+        :return: None
+        '''
+        self.Clear()
+        self.actions = list(actions)
+        self.position = position
+        self.snapshots = {position: self.snapshot()} # The only point known without replaying, more are added as they are passed
+
+    def Begin(self):
+        '''
+        Starts grouping moves into one action, can be nested
+        :return: None
+        '''
+        self.depth += 1
+
+    def End(self):
+        '''
+        Finishes the action started by the matching Begin
+        :return: None
+        '''
+        self.depth -= 1
+        if self.depth == 0:
+            self.Commit()
+
+    def Record(self, move):
+        '''
+        Logs a move, on its own or as part of the action between Begin and End
+        :param move: Move
+        :return: None
+        '''
+        if self.replaying:
+            return
+        self.pending.append(move)
+        if self.depth == 0:
+            self.Commit()
+
+    def Commit(self):
+        '''
+        Appends the pending moves as an action. Anything that had been undone can't be redone after this
+        :return: None
+        '''
+        if not self.pending:
+            return
+        if self.position < len(self.actions): # Branching off after an undo, the old future goes
+            del self.actions[self.position:]
+            for key in [key for key in self.snapshots if key > self.position]:
+                del self.snapshots[key]
+        self.actions.append(tuple(self.pending))
+        self.pending = []
+        self.position += 1
+        self.Visited()
+
+    def Visited(self):
+        '''
+        Called whenever the position changes, takes a snapshot every snapshot_every actions if there isn't one already
+        :return: None
+        '''
+        if self.position % self.snapshot_every == 0 and self.position not in self.snapshots:
+            self.snapshots[self.position] = self.snapshot()
+
+    def Undo(self):
+        '''
+        :return: tuple of Moves to reverse (last first), or None if there is nothing to undo
+        '''
+        if self.position == 0:
+            return None
+        self.position -= 1
+        return tuple(reversed(self.actions[self.position]))
+
+    def Redo(self):
+        '''
+        :return: tuple of Moves to apply again, or None if there is nothing to redo
+        '''
+        if self.position == len(self.actions):
+            return None
+        self.position += 1
+        return self.actions[self.position - 1]
+
+    def Plan(self, target):
+        '''
+        Works out the cheapest way of getting to another point in the history and moves the position there
+        :param target: Number of actions that should be applied afterwards
+        :return: (Snapshot or None, list of (Move, forward)): Restore the snapshot first if there is one, then apply each
+                 move going forward (to its after value) or backward (to its before value)
+        '''
+        target = max(0, min(target, len(self.actions)))
+        earlier = [key for key in self.snapshots if key <= target]
+        base = max(earlier) if earlier else None
+        if base is not None and target - base + SNAPSHOT_COST < abs(target - self.position):
+            snapshot = self.snapshots[base]
+            steps = [(move, True) for action in self.actions[base:target] for move in action]
+        elif target < self.position:
+            snapshot = None
+            steps = [(move, False) for action in reversed(self.actions[target:self.position]) for move in reversed(action)]
+        else:
+            snapshot = None
+            steps = [(move, True) for action in self.actions[self.position:target] for move in action]
+        self.position = target
+        return snapshot, steps
@@ -0,0 +1,278 @@
+"""
+Streams puzzles out of collections of any size.
+A collection can hold puzzles as one 81 character line each (anything after the 81st character, such as a rating, is
+ignored) or as nine lines of nine cells like the puzzles file, with 0 or . for empty squares. Blank lines and lines
+starting with # separate puzzles, and grid separators like "---+---" or "|" are skipped. Plain and gzip files are both
+read (gzip is spotted from its first bytes, not the name), and plain files can also be read through a memory map.
+The file is read in large chunks and the lines are picked out of each chunk as bytes, so nothing is held in memory apart
+from the chunk being worked on. To jump to the Nth puzzle a sidecar index (<file>.idx) is kept with the byte offset of
+every INDEX_STRIDE-th puzzle. It is built the first time it is needed and rebuilt when the collection changes.
+Collections of 16x16 or 25x25 puzzles are read the same way with box_size 4 or 5, as 256/625 character lines or 16/25
+lines of cells written 1-9 then A-G (or A-P), in either case.
+The command line tools (SolveSudoku.py, validate.py and stats.py) share chunks and map_chunks to send a collection to a
+pool of worker processes a chunk at a time.
+"""
+import array
+import collections
+import concurrent.futures
+import gzip
+import mmap
+import os
+import struct
+import sys
+from engine import SYMBOLS
+
+CHUNK_SIZE = 1 << 20 # Bytes read at a time
+INDEX_STRIDE = 256 # Puzzles between entries in the sidecar index
+INDEX_MAGIC = b"SDKI"
+INDEX_VERSION = 2
+INDEX_HEADER = struct.Struct("<4sBBIQqQ") # magic, version, box size, stride, file size, file mtime_ns, number of puzzles
+GZIP_MAGIC = b"\x1f\x8b"
+
+CELLS = b"0123456789." # Characters that can stand for a cell
+SEPARATORS = b" \t|+-" # Characters dropped from the nine line layout
+DOTS = bytes.maketrans(b".", b"0")
+
+
+def cell_characters(box_size):
+    '''
+    :param box_size: Width of a box, 3 for the normal 9x9 board
+    :return: (bytes, bytes): The characters that can stand for a cell and the translation that turns . into 0 and letters
+             into capitals
+    '''
+    if box_size == 3:
+        return CELLS, DOTS
+    symbols = SYMBOLS[:box_size * box_size].encode("ascii")
+    return b"0." + symbols + symbols.lower(), bytes.maketrans(b"." + symbols.lower(), b"0" + symbols)
+
+
+def scan(f, offset=0, chunk_size=CHUNK_SIZE, box_size=3):
+    '''
+    Picks the puzzles out of a binary file from its current position
+    :param f: Binary file object (or mmap) positioned at the start of a line
+    :param offset: Byte offset of that position, used to report where each puzzle starts
+    :param chunk_size: Bytes read at a time
+    :param box_size: 3 for 9x9 puzzles, 4 for 16x16 and 5 for 25x25
+    :return: Generator of (offset of the puzzle's first line, puzzle string with 0 for empty, 81 characters for 9x9)
+    '''
+    side = box_size * box_size # Cells in a row
+    count = side * side # Cells in a puzzle
+    cells, dots = cell_characters(box_size)
+    rows = [] # Cells of a nine line puzzle collected so far
+    start = offset
+    tail = b"" # Unfinished line at the end of the last chunk
+    while True:
+        chunk = f.read(chunk_size)
+        lines = (tail + chunk).split(b"\n")
+        tail = lines.pop() if chunk else b""
+        for line in lines:
+            line_start = offset
+            offset += len(line) + 1
+            line = line.strip()
+            if not line or line[:1] == b"#": # Blank lines and comments separate puzzles
+                rows = []
+                continue
+            if len(line) >= count and not line[:count].translate(None, cells): # One line layout
+                rows = []
+                yield line_start, line[:count].translate(dots).decode("ascii")
+                continue
+            row = line.translate(None, SEPARATORS)
+            if len(row) == side and not row.translate(None, cells): # One row of the nine line layout
+                if not rows:
+                    start = line_start
+                rows.append(row)
+                if len(rows) == side:
+                    yield start, b"".join(rows).translate(dots).decode("ascii")
+                    rows = []
+            elif row: # Anything else breaks up a half read grid, a line of separators doesn't
+                rows = []
+        if not chunk:
+            return
+
+
+class PuzzleFile(object):
+    """
+    A puzzle collection on disk that can be iterated over or indexed like a list without reading it all in
+    """
+    def __init__(self, path, memory_map=False, chunk_size=CHUNK_SIZE, box_size=3):
+        '''
+        :param path: Plain or gzip puzzle file
+        :param memory_map: Read plain files through a memory map instead of file reads
+        :param chunk_size: Bytes read at a time
+        :param box_size: 3 for a collection of 9x9 puzzles, 4 for 16x16 and 5 for 25x25
+        '''
+        self.path = path
+        self.memory_map = memory_map
+        self.chunk_size = chunk_size
+        self.box_size = box_size
+        self.index_path = path + ".idx"
+        self.offsets = None # array of the offset of every INDEX_STRIDE-th puzzle, loaded when first needed
+        self.count = None # Number of puzzles, known once the index is
+
+    def Open(self):
+        '''
+        :return: Binary file-like object over the puzzle text, whether the file is plain or gzip
+        '''
+        f = open(self.path, "rb")
+        if f.read(2) == GZIP_MAGIC:
+            f.close()
+            return gzip.open(self.path, "rb") # Seeking works on the uncompressed offsets
+        f.seek(0)
+        if self.memory_map:
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError: # An empty file can't be mapped
+                return f
+            f.close()
+            return mapped
+        return f
+
+    def __iter__(self):
+        return self.Iterate()
+
+    def Iterate(self, start=0):
+        '''
+        :param start: Number of the first puzzle wanted, reached through the index rather than reading everything before it
+        :return: Generator of 81 digit puzzle strings
+        '''
+        offset, skip = 0, start
+        if start:
+            offset, skip = self.Seek(start)
+        with self.Open() as f:
+            f.seek(offset)
+            for position, puzzle in scan(f, offset, self.chunk_size, self.box_size):
+                if skip:
+                    skip -= 1
+                    continue
+                yield puzzle
+
+    def __getitem__(self, index):
+        '''
+        :param index: Puzzle number from 0 (negative counts from the end)
+        :return: str: 81 digit puzzle
+        '''
+        if index < 0:
+            index += len(self)
+        if index >= 0:
+            for puzzle in self.Iterate(index):
+                return puzzle
+        raise IndexError("puzzle index out of range")
+
+    def __len__(self):
+        self.Index()
+        return self.count
+
+    def Seek(self, index):
+        '''
+        :param index: Puzzle number
+        :return: (int, int): Offset of the nearest indexed puzzle at or before it, and how many puzzles to skip from there
+        '''
+        self.Index()
+        if not self.offsets:
+            return 0, index
+        block = min(index // INDEX_STRIDE, len(self.offsets) - 1)
+        return self.offsets[block], index - block * INDEX_STRIDE
+
+    def Index(self):
+        '''
+        Makes sure the sidecar index is loaded, reading it from disk if it is up to date and building it otherwise
+        :return: None
+        '''
+        if self.offsets is None and not self.ReadIndex():
+            self.BuildIndex()
+
+    def Stamp(self):
+        '''
+        :return: (int, int): Size and modification time of the collection, used to spot a stale index
+        '''
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def ReadIndex(self):
+        '''
+        :return: bool: True if an up to date sidecar index was loaded
+        '''
+        try:
+            with open(self.index_path, "rb") as f:
+                header = f.read(INDEX_HEADER.size)
+                if len(header) < INDEX_HEADER.size:
+                    return False
+                magic, version, box_size, stride, size, mtime, count = INDEX_HEADER.unpack(header)
+                if magic != INDEX_MAGIC or version != INDEX_VERSION or box_size != self.box_size or stride != INDEX_STRIDE \
+                        or (size, mtime) != self.Stamp():
+                    return False
+                offsets = array.array("Q")
+                offsets.frombytes(f.read())
+        except OSError:
+            return False
+        if sys.byteorder == "big": # Stored little endian
+            offsets.byteswap()
+        self.offsets, self.count = offsets, count
+        return True
+
+    def BuildIndex(self):
+        '''
+        Reads the whole collection once to find where every INDEX_STRIDE-th puzzle starts and saves that alongside it.
+        If the sidecar can't be written (e.g. a read-only folder) the index is just kept in memory.
+        :return: None
+        '''
+        stamp = self.Stamp()
+        offsets = array.array("Q")
+        count = 0
+        with self.Open() as f:
+            for position, puzzle in scan(f, 0, self.chunk_size, self.box_size):
+                if count % INDEX_STRIDE == 0:
+                    offsets.append(position)
+                count += 1
+        self.offsets, self.count = offsets, count
+        stored = array.array("Q", offsets)
+        if sys.byteorder == "big":
+            stored.byteswap()
+        try:
+            with open(self.index_path, "wb") as f:
+                f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, self.box_size, INDEX_STRIDE, stamp[0], stamp[1], count))
+                f.write(stored.tobytes())
+        except OSError:
+            pass
+
+
+def chunks(puzzles, chunk_size):
+    '''
+    Groups a stream of puzzles into lists of chunk_size
+    :return: Generator of lists
+    '''
+    chunk = []
+    for puzzle in puzzles:
+        chunk.append(puzzle)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def map_chunks(work, puzzles, workers, chunk_size, *args):
+    '''
+    Runs work(chunk, *args) over a collection a chunk at a time on a pool of worker processes. Only workers*2 chunks are
+    ever in flight, so however big the collection is only a few chunks are held in memory, and the results come back in
+    input order so they can be written out as they arrive.
+    :param work: Module level function (so the workers can find it) taking a list of puzzles and the extra args
+    :param puzzles: Iterable of puzzle strings, e.g. a PuzzleFile
+    :param workers: Number of worker processes (1 runs everything in this process)
+    :param chunk_size: Number of puzzles sent to a worker at a time
+    :return: Generator of (chunk, result)
+    '''
+    if workers <= 1:
+        for chunk in chunks(puzzles, chunk_size):
+            yield chunk, work(chunk, *args)
+        return
+    pending = collections.deque() # (chunk, future) in input order
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunks(puzzles, chunk_size):
+            pending.append((chunk, pool.submit(work, chunk, *args)))
+            if len(pending) >= workers * 2: # Enough work queued, wait for the oldest chunk before reading more
+                chunk, future = pending.popleft()
+                yield chunk, future.result()
+        while pending:
+            chunk, future = pending.popleft()
+            yield chunk, future.result()
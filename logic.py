@@ -0,0 +1,355 @@
+"""
+Step by step logical solver that only uses the techniques a person would.
+The techniques are tried in a fixed order, easiest first, and every time one of them changes the board a Step is
+recorded. After any progress the search goes back to the easiest technique, so the trace reads like a human solve.
+Each technique has a weight and the difficulty score of a puzzle is the sum of the weights of the steps it took, while
+the grade comes from the hardest technique that was needed.
+Like the solver this module does not import tkinter and works on the puzzles file format, for 9x9 boards and the
+bigger 16x16 and 25x25 ones alike.
+"""
+import collections
+import itertools
+import engine
+from solver import parse_grid
+
+# technique: name of the technique used
+# placements: tuple of (cell, digit) filled in by the step
+# eliminations: tuple of (cell, digit) candidates removed by the step
+# cells: the cells that make up the pattern, used for highlighting hints
+Step = collections.namedtuple("Step", "technique placements eliminations cells")
+
+# solved: True if the techniques were enough to finish the puzzle
+# grid: The board at the point the techniques ran out (the solution when solved)
+# steps: list of Step in the order they were found
+# score: Sum of the technique weights of every step
+# grade: Name of the difficulty band, see GRADES
+Analysis = collections.namedtuple("Analysis", "solved grid steps score grade")
+
+
+class Tables(object):
+    """
+    The units of a board split up the way the techniques want them, made once per box size
+    """
+    def __init__(self, geometry):
+        size = geometry.SIZE
+        self.ROWS = geometry.UNITS[0:size]
+        self.COLS = geometry.UNITS[size:2 * size]
+        self.BOXES = geometry.UNITS[2 * size:3 * size]
+        # Cells of each box that lie in each row/column, used by the intersection techniques
+        self.BOX_LINES = tuple(
+            (b, line, tuple(i for i in self.BOXES[b] if i in line))
+            for b in range(size) for line in self.ROWS + self.COLS if any(i in line for i in self.BOXES[b])
+        )
+
+
+_tables = {}
+
+
+def tables(geometry):
+    '''
+    :param geometry: engine.Geometry of the board
+    :return: Tables for that board size
+    '''
+    found = _tables.get(geometry.BOX_SIZE)
+    if found is None:
+        found = _tables[geometry.BOX_SIZE] = Tables(geometry)
+    return found
+
+
+# The band a puzzle falls into is decided by the weight of the hardest step it needed
+GRADES = ((2, "Easy"), (6, "Medium"), (14, "Hard"), (20, "Expert"))
+
+
+class LogicSolver(object):
+    """
+    Applies the human techniques to a single board.
+    The board is held as an engine.BoardState so placing a digit keeps the candidates of its peers up to date, and the
+    techniques remove candidates straight out of state.candidates.
+    """
+    def __init__(self, grid):
+        '''
+        :param grid: Puzzle in any format accepted by solver.parse_grid
+        '''
+        self.state = engine.BoardState(parse_grid(grid))
+        self.geometry = self.state.geometry
+        self.tables = tables(self.geometry)
+        self.steps = []
+        # The techniques in the order they are tried along with their weight for the difficulty score
+        self.techniques = (
+            ("Naked Single", 1, self.NakedSingles),
+            ("Hidden Single", 2, self.HiddenSingles),
+            ("Pointing Pair", 5, self.PointingPairs),
+            ("Box/Line Reduction", 6, self.BoxLineReduction),
+            ("Naked Pair", 8, lambda: self.NakedSubsets(2, "Naked Pair")),
+            ("Hidden Pair", 10, lambda: self.HiddenSubsets(2, "Hidden Pair")),
+            ("Naked Triple", 12, lambda: self.NakedSubsets(3, "Naked Triple")),
+            ("Hidden Triple", 14, lambda: self.HiddenSubsets(3, "Hidden Triple")),
+            ("X-Wing", 20, self.XWing),
+        )
+        self.weights = {name: weight for name, weight, finder in self.techniques}
+
+    def Run(self, placements=True):
+        '''
+        Keeps applying the easiest technique that makes progress until the board is full or nothing works
+        :param placements: If False the singles are skipped so only candidates are removed, which is what auto pencil uses
+        :return: bool: True if the board was completed
+        '''
+        techniques = self.techniques if placements else self.techniques[2:]
+        while not self.state.IsFull():
+            if self.Broken():
+                return False
+            for name, weight, finder in techniques:
+                if finder():
+                    break
+            else: # Nothing applies, the puzzle needs something harder (or guessing)
+                return False
+        return True
+
+    def NextStep(self):
+        '''
+        Applies the easiest technique that makes progress once
+        :return: bool: True if something was found
+        '''
+        if self.state.IsFull() or self.Broken():
+            return False
+        for name, weight, finder in self.techniques:
+            if finder():
+                return True
+        return False
+
+    def Broken(self):
+        '''
+        :return: bool: True if an empty cell has run out of candidates, meaning the board can't be solved
+        '''
+        cells = self.state.cells
+        candidates = self.state.candidates
+        for i in range(self.geometry.CELLS):
+            if not cells[i] and not candidates[i]:
+                return True
+        return False
+
+    def Analyse(self):
+        '''
+        Runs the techniques and sums up the result
+        :return: Analysis
+        '''
+        solved = self.Run()
+        score = sum(self.weights[step.technique] for step in self.steps)
+        hardest = max([self.weights[step.technique] for step in self.steps] or [0])
+        if not solved:
+            grade = "Unsolved"
+        else:
+            grade = GRADES[-1][1]
+            for limit, name in GRADES:
+                if hardest <= limit:
+                    grade = name
+                    break
+        return Analysis(solved, self.state.ToString(), self.steps, score, grade)
+
+    def Place(self, technique, i, num, cells):
+        '''
+        Fills in a cell and records the step
+        :return: bool: True if the digit could still go there
+        '''
+        if self.state.cells[i] or not self.state.candidates[i] & (1 << (num - 1)):
+            return False # An earlier step in the same sweep already dealt with it
+        self.state.Place(self.geometry.ROW[i], self.geometry.COL[i], num)
+        self.steps.append(Step(technique, ((i, num),), (), cells))
+        return True
+
+    def Eliminate(self, technique, removals, cells):
+        '''
+        Takes candidates away and records the step if anything actually changed
+        :param removals: Iterable of (cell, mask of digits to remove)
+        :return: bool: True if any candidate was removed
+        '''
+        candidates = self.state.candidates
+        digits_of = self.geometry.DIGITS_OF
+        eliminations = []
+        for i, mask in removals:
+            hit = candidates[i] & mask
+            if hit:
+                candidates[i] &= ~hit
+                for num in digits_of[hit]:
+                    eliminations.append((i, num))
+        if eliminations:
+            self.steps.append(Step(technique, (), tuple(eliminations), tuple(cells)))
+            return True
+        return False
+
+    def NakedSingles(self):
+        '''
+        Cells with only one candidate left
+        '''
+        cells = self.state.cells
+        candidates = self.state.candidates
+        progress = False
+        for i in range(self.geometry.CELLS):
+            mask = candidates[i]
+            if not cells[i] and mask and not mask & (mask - 1): # Exactly one bit set
+                progress |= self.Place("Naked Single", i, mask.bit_length(), (i,))
+        return progress
+
+    def HiddenSingles(self):
+        '''
+        Digits that only have one possible cell in a row, column or box
+        '''
+        candidates = self.state.candidates
+        progress = False
+        for unit in self.geometry.UNITS:
+            once = 0
+            twice = 0
+            for i in unit:
+                mask = candidates[i]
+                twice |= once & mask
+                once |= mask
+            hidden = once & ~twice
+            for num in self.geometry.DIGITS_OF[hidden]:
+                bit = 1 << (num - 1)
+                for i in unit:
+                    if candidates[i] & bit:
+                        progress |= self.Place("Hidden Single", i, num, unit)
+                        break
+        return progress
+
+    def PointingPairs(self):
+        '''
+        When a digit in a box can only go in one row or column, it can't go anywhere else in that row or column
+        '''
+        candidates = self.state.candidates
+        BOX = self.geometry.BOX
+        for b, line, shared in self.tables.BOX_LINES:
+            inside = 0
+            for i in shared:
+                inside |= candidates[i]
+            outside = 0
+            for i in self.tables.BOXES[b]:
+                if i not in shared:
+                    outside |= candidates[i]
+            pointing = inside & ~outside # Digits confined to the part of the box on this line
+            if pointing and self.Eliminate("Pointing Pair", ((i, pointing) for i in line if BOX[i] != b), shared):
+                return True
+        return False
+
+    def BoxLineReduction(self):
+        '''
+        When a digit in a row or column can only go in one box, it can't go anywhere else in that box
+        '''
+        candidates = self.state.candidates
+        BOX = self.geometry.BOX
+        for b, line, shared in self.tables.BOX_LINES:
+            inside = 0
+            for i in shared:
+                inside |= candidates[i]
+            outside = 0
+            for i in line:
+                if BOX[i] != b:
+                    outside |= candidates[i]
+            confined = inside & ~outside # Digits of the line that only appear inside this box
+            if confined and self.Eliminate("Box/Line Reduction", ((i, confined) for i in self.tables.BOXES[b] if i not in shared), shared):
+                return True
+        return False
+
+    def NakedSubsets(self, size, technique):
+        '''
+        size cells in a unit that share exactly size candidates between them, so no other cell in the unit can have them
+        '''
+        candidates = self.state.candidates
+        bit_count = self.geometry.BIT_COUNT
+        for unit in self.geometry.UNITS:
+            open_cells = [i for i in unit if 2 <= bit_count[candidates[i]] <= size]
+            if len(open_cells) < size:
+                continue
+            for group in itertools.combinations(open_cells, size):
+                union = 0
+                for i in group:
+                    union |= candidates[i]
+                if bit_count[union] == size:
+                    removals = ((i, union) for i in unit if i not in group)
+                    if self.Eliminate(technique, removals, group):
+                        return True
+        return False
+
+    def HiddenSubsets(self, size, technique):
+        '''
+        size digits that can only go in the same size cells of a unit, so those cells can't hold anything else
+        '''
+        candidates = self.state.candidates
+        for unit in self.geometry.UNITS:
+            places = {} # digit -> cells of the unit it could go in
+            for num in range(1, self.geometry.SIZE + 1):
+                bit = 1 << (num - 1)
+                where = tuple(i for i in unit if candidates[i] & bit)
+                if 2 <= len(where) <= size:
+                    places[num] = where
+            if len(places) < size:
+                continue
+            for digits in itertools.combinations(places, size):
+                group = set()
+                for num in digits:
+                    group.update(places[num])
+                if len(group) == size:
+                    keep = 0
+                    for num in digits:
+                        keep |= 1 << (num - 1)
+                    if self.Eliminate(technique, ((i, self.geometry.ALL & ~keep) for i in group), sorted(group)):
+                        return True
+        return False
+
+    def XWing(self):
+        '''
+        A digit that can only go in the same two columns of two rows (or the same two rows of two columns) can't go
+        anywhere else in those columns (or rows)
+        '''
+        candidates = self.state.candidates
+        rows = self.tables.ROWS
+        cols = self.tables.COLS
+        for lines, crosses in ((rows, cols), (cols, rows)):
+            for num in range(1, self.geometry.SIZE + 1):
+                bit = 1 << (num - 1)
+                pairs = {} # The two positions along the line -> lines that have them
+                for n, line in enumerate(lines):
+                    where = tuple(k for k, i in enumerate(line) if candidates[i] & bit)
+                    if len(where) == 2:
+                        pairs.setdefault(where, []).append(n)
+                for where, found in pairs.items():
+                    if len(found) != 2:
+                        continue
+                    corners = [lines[n][k] for n in found for k in where]
+                    removals = ((i, bit) for k in where for i in crosses[k] if i not in corners)
+                    if self.Eliminate("X-Wing", removals, corners):
+                        return True
+        return False
+
+
+def analyse(grid):
+    '''
+    Solves a puzzle with the human techniques only
+    :param grid: Puzzle in any format accepted by solver.parse_grid
+    :return: Analysis
+    '''
+    return LogicSolver(grid).Analyse()
+
+
+def next_step(grid):
+    '''
+    Finds the first step a person would take from the given position
+    :param grid: Puzzle in any format accepted by solver.parse_grid
+    :return: Step or None if no technique applies
+    '''
+    logic = LogicSolver(grid)
+    if logic.NextStep():
+        return logic.steps[0]
+    return None
+
+
+def pencil_marks(grid):
+    '''
+    Works out the pencil marks for a board, starting from the basic candidates and then removing everything the
+    elimination techniques (pointing pairs, box/line reduction, subsets and X-wings) can rule out without placing digits
+    :param grid: Puzzle in any format accepted by solver.parse_grid
+    :return: (list, list): The candidate mask of every cell and the elimination steps that produced them
+    '''
+    logic = LogicSolver(grid)
+    logic.Run(placements=False)
+    return list(logic.state.candidates), logic.steps
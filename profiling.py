@@ -0,0 +1,132 @@
+"""
+Opt-in timing of the GameBoard hot paths.
+Nothing here runs unless profiling is switched on, either with GameBoard(..., profile=True) or by setting the
+SUDOKU_PROFILE environment variable to anything other than 0. When it is off the GameBoard methods are left exactly as
+they are, so there is no cost at all. When it is on the chosen methods are wrapped on the instance to record call
+counts, total time and the latency percentiles of recent calls, along with gauges such as the number of canvas items.
+If SUDOKU_PROFILE_FILE is set the stats are also written there as JSON when the program exits.
+"""
+import atexit
+import collections
+import functools
+import json
+import os
+import time
+
+SAMPLES = 5000 # Latencies kept per method for the percentiles
+
+
+def enabled_by_environment():
+    '''
+    :return: bool: True if the SUDOKU_PROFILE environment variable asks for profiling
+    '''
+    return os.environ.get("SUDOKU_PROFILE", "0") not in ("", "0")
+
+
+class Profiler(object):
+    """
+    Collects timings for wrapped methods and the latest value of any gauges
+    """
+    def __init__(self, dump_path=None):
+        '''
+        :param dump_path: If given the stats are written to this file when the program exits
+        '''
+        self.calls = collections.Counter() # name -> number of calls
+        self.total = collections.Counter() # name -> seconds spent, including nested instrumented calls
+        self.samples = {} # name -> deque of the most recent latencies
+        self.gauges = {} # name -> (latest value, highest value)
+        self.depth = 0 # Timed calls currently running, a wrapped method can call another one
+        if dump_path:
+            atexit.register(self.Dump, dump_path)
+
+    def Wrap(self, obj, names, after=None):
+        '''
+        Replaces the named methods on obj (the instance only, not the class) with timed versions
+        :param obj: Object whose methods should be timed
+        :param names: Method names
+        :param after: Optional function called after each outermost timed call (not the ones it makes itself), used to
+                      sample gauges once per action without its cost landing in any of the timings
+        :return: None
+        '''
+        for name in names:
+            setattr(obj, name, self.Timed(name, getattr(obj, name), after))
+
+    def Timed(self, name, method, after=None):
+        '''
+        :return: function: method with its latency recorded under name
+        '''
+        samples = self.samples.setdefault(name, collections.deque(maxlen=SAMPLES))
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            self.depth += 1
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                self.depth -= 1
+                self.calls[name] += 1
+                self.total[name] += elapsed
+                samples.append(elapsed)
+                if after is not None and not self.depth: # Only once the whole action is done
+                    after()
+        return timed
+
+    def Record(self, name, elapsed):
+        '''
+        Adds one latency by hand, for things that can't be wrapped such as the coroutines of the puzzle server
+        :param name: What was timed
+        :param elapsed: Seconds it took
+        :return: None
+        '''
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = collections.deque(maxlen=SAMPLES)
+        self.calls[name] += 1
+        self.total[name] += elapsed
+        samples.append(elapsed)
+
+    def Gauge(self, name, value):
+        '''
+        Records the current value of something that isn't a time, e.g. how many items are on the canvas
+        :return: None
+        '''
+        highest = self.gauges.get(name, (value, value))[1]
+        self.gauges[name] = (value, max(highest, value))
+
+    def Stats(self):
+        '''
+        :return: dict: {"methods": {name: {...}}, "gauges": {name: {...}}} with times in milliseconds
+        '''
+        methods = {}
+        for name, samples in self.samples.items():
+            if not self.calls[name]:
+                continue
+            ordered = sorted(samples)
+            pick = lambda fraction: ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+            methods[name] = {"calls": self.calls[name], "total_ms": self.total[name] * 1000,
+                             "mean_ms": self.total[name] * 1000 / self.calls[name],
+                             "p50_ms": pick(0.5), "p90_ms": pick(0.9), "p99_ms": pick(0.99), "max_ms": ordered[-1] * 1000}
+        gauges = dict((name, {"latest": latest, "max": highest}) for name, (latest, highest) in self.gauges.items())
+        return {"methods": methods, "gauges": gauges}
+
+    def Report(self):
+        '''
+        :return: str: The stats as a table for the stats panel
+        '''
+        stats = self.Stats()
+        lines = ["%-15s %6s %9s %8s %8s %8s" % ("method", "calls", "total ms", "p50", "p90", "p99")]
+        for name, row in sorted(stats["methods"].items(), key=lambda item: -item[1]["total_ms"]):
+            lines.append("%-15s %6d %9.1f %8.2f %8.2f %8.2f" % (name, row["calls"], row["total_ms"], row["p50_ms"], row["p90_ms"], row["p99_ms"]))
+        for name, row in sorted(stats["gauges"].items()):
+            lines.append("%s: %d (max %d)" % (name, row["latest"], row["max"]))
+        return "\n".join(lines)
+
+    def Dump(self, path):
+        '''
+        Writes the stats to a JSON file
+        :return: None
+        '''
+        with open(path, "w") as f:
+            json.dump(self.Stats(), f, indent=2, sort_keys=True)
@@ -0,0 +1,252 @@
+"""
+Saving and resuming games in a compact binary format.
+A saved game holds the givens, every digit on the board, the pencil marks, the undo history and the time played. A
+game with no history packs into about 85 bytes:
+    magic "SDK", version (1 byte), flags (1 byte)
+    givens bitmap (11 bytes, bit i set = cell i is a given)
+    given digits (two givens per byte in cell order, high nibble first), kept apart from the board's digits because the
+    player can erase or overwrite a given
+    digits (41 bytes, two cells per byte, high nibble first, 0 for empty)
+    elapsed milliseconds (uint32)
+    pencil bitmap (11 bytes, bit i set = cell i has marks) then a uint16 9-bit mask for each of those cells
+    history: position, number of actions, then for each action its number of moves and the moves (all counts varints)
+A digit move takes 2 bytes (cell, before << 4 | after) and a pencil move 4 (cell | 0x80, then the before and after
+masks in 18 bits). Every number is little endian.
+Many games can be kept in one archive file, which ends with a table of record offsets so any game can be read by
+index straight out of a memory map without reading the rest.
+"""
+import collections
+import mmap
+import struct
+import engine
+import history
+
+MAGIC = b"SDK"
+VERSION = 2 # Version 1 had no given digits, the givens were read off the board's digits
+ARCHIVE_MAGIC = b"SDKA"
+ARCHIVE_VERSION = 1
+
+# givens: 81 digit string of the puzzle, cells: 81 digit string of the board now, pencils: tuple of 81 pencil masks,
+# actions: list of tuples of history.Move, position: how many actions are applied, elapsed: seconds played
+Game = collections.namedtuple("Game", "givens cells pencils actions position elapsed")
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def _bitmap(flags):
+    '''
+    :param flags: 81 bools
+    :return: bytes: 11 byte bitmap
+    '''
+    bits = 0
+    for index, flag in enumerate(flags):
+        if flag:
+            bits |= 1 << index
+    return bits.to_bytes(11, "little")
+
+
+def encode(game):
+    '''
+    Packs a game into the binary format
+    :param game: Game of a 9x9 board, the format has no room for the digits and masks of the bigger boards
+    :return: bytes
+    '''
+    if len(game.givens) != 81:
+        raise ValueError("Only 9x9 games can be saved")
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    out.append(0) # Flags, none defined yet
+    out += _bitmap(num != "0" for num in game.givens)
+    givens = [int(num) for num in game.givens if num != "0"] + [0]
+    out += bytes((givens[i] << 4) | givens[i + 1] for i in range(0, len(givens) - 1, 2))
+    cells = [int(num) for num in game.cells] + [0]
+    out += bytes((cells[i] << 4) | cells[i + 1] for i in range(0, 82, 2))
+    out += struct.pack("<I", int(round(game.elapsed * 1000)))
+    out += _bitmap(game.pencils)
+    for mask in game.pencils:
+        if mask:
+            out += struct.pack("<H", mask)
+    _write_varint(out, game.position)
+    _write_varint(out, len(game.actions))
+    for action in game.actions:
+        _write_varint(out, len(action))
+        for move in action:
+            if move.kind == "digit":
+                out.append(move.index)
+                out.append((move.before << 4) | move.after)
+            else:
+                out.append(move.index | 0x80)
+                masks = (move.before << 9) | move.after
+                out += masks.to_bytes(3, "little")
+    return bytes(out)
+
+
+def decode(data):
+    '''
+    Unpacks a game made by encode
+    :param data: bytes (or anything that slices like it, such as an mmap)
+    :return: Game
+    '''
+    if bytes(data[:3]) != MAGIC:
+        raise ValueError("Not a saved Sudoku game")
+    if data[3] > VERSION:
+        raise ValueError("Saved game version %d is newer than this program understands" % data[3])
+    pos = 5
+    givens_bits = int.from_bytes(data[pos:pos + 11], "little")
+    pos += 11
+    given_digits = None
+    if data[3] >= 2:
+        count = bin(givens_bits).count("1")
+        given_digits = []
+        for byte in data[pos:pos + (count + 1) // 2]:
+            given_digits.append(byte >> 4)
+            given_digits.append(byte & 0x0F)
+        given_digits = iter(given_digits[:count])
+        pos += (count + 1) // 2
+    cells = []
+    for byte in data[pos:pos + 41]:
+        cells.append(byte >> 4)
+        cells.append(byte & 0x0F)
+    cells = cells[:81]
+    pos += 41
+    elapsed = struct.unpack_from("<I", data, pos)[0] / 1000
+    pos += 4
+    pencil_bits = int.from_bytes(data[pos:pos + 11], "little")
+    pos += 11
+    pencils = []
+    for index in range(81):
+        if pencil_bits >> index & 1:
+            pencils.append(struct.unpack_from("<H", data, pos)[0])
+            pos += 2
+        else:
+            pencils.append(0)
+    position, pos = _read_varint(data, pos)
+    count, pos = _read_varint(data, pos)
+    actions = []
+    for n in range(count):
+        moves, pos = _read_varint(data, pos)
+        action = []
+        for m in range(moves):
+            first = data[pos]
+            if first & 0x80:
+                masks = int.from_bytes(data[pos + 1:pos + 4], "little")
+                action.append(history.Move("pencil", first & 0x7F, masks >> 9, masks & engine.ALL))
+                pos += 4
+            else:
+                action.append(history.Move("digit", first, data[pos + 1] >> 4, data[pos + 1] & 0x0F))
+                pos += 2
+        actions.append(tuple(action))
+    if given_digits is None: # Version 1, the best that can be done is the digit that is on the board now
+        given_digits = (num for index, num in enumerate(cells) if givens_bits >> index & 1)
+    givens = "".join(str(next(given_digits)) if givens_bits >> index & 1 else "0" for index in range(81))
+    return Game(givens, "".join(map(str, cells)), tuple(pencils), actions, position, elapsed)
+
+
+def save(path, game):
+    '''
+    Writes one game to a file
+    :return: None
+    '''
+    with open(path, "wb") as f:
+        f.write(encode(game))
+
+
+def load(path):
+    '''
+    :return: Game: The game saved in a file
+    '''
+    with open(path, "rb") as f:
+        return decode(f.read())
+
+
+class ArchiveWriter(object):
+    """
+    Writes many games into one archive file: a header, the encoded games one after another, a table of where each one
+    starts and finally the number of games and where the table is
+    """
+    def __init__(self, path):
+        self.file = open(path, "wb")
+        self.file.write(ARCHIVE_MAGIC + bytes([ARCHIVE_VERSION]))
+        self.offsets = bytearray() # uint64 offset of every game so far
+
+    def Add(self, game):
+        '''
+        Appends a game to the archive
+        :return: None
+        '''
+        self.offsets += struct.pack("<Q", self.file.tell())
+        self.file.write(encode(game))
+
+    def Close(self):
+        '''
+        Writes the offset table and footer and closes the file
+        :return: None
+        '''
+        end = self.file.tell()
+        self.offsets += struct.pack("<Q", end) # The end of the last game
+        self.file.write(self.offsets)
+        self.file.write(struct.pack("<QQ", len(self.offsets) // 8 - 1, end))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.Close()
+
+
+class GameArchive(object):
+    """
+    Reads games out of an archive by index through a memory map, so opening even a very large archive costs nothing
+    and each game read only touches its own bytes
+    """
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:4] != ARCHIVE_MAGIC:
+            raise ValueError("Not a saved game archive")
+        if self.map[4] > ARCHIVE_VERSION:
+            raise ValueError("Archive version %d is newer than this program understands" % self.map[4])
+        self.count, self.table = struct.unpack_from("<QQ", self.map, len(self.map) - 16)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        '''
+        :param index: Position of the game in the archive (negative counts from the end)
+        :return: Game
+        '''
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("archive index out of range")
+        start, end = struct.unpack_from("<QQ", self.map, self.table + index * 8)
+        return decode(self.map[start:end])
+
+    def Close(self):
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.Close()
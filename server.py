@@ -0,0 +1,490 @@
+"""
+Local puzzle server for the web front end, built on asyncio with nothing outside the standard library.
+Every endpoint takes a POST with a JSON body of {"puzzle": "..."} (any format accepted by solver.parse_grid) or
+{"puzzles": [...]} for several at once, and answers with the result or a list of {"result": ...}/{"error": ...}:
+    /solve     {"solution": "..."} (null if there is none)
+    /validate  {"verdict": "0", "1", "many" or "invalid", "solutions": n, "conflicts": [[cell, cell], ...]}
+    /hint      {"technique": ..., "placements": [[cell, digit], ...], "eliminations": [...], "cells": [...]} or null
+    /grade     {"grade": "Hard", "score": 23, "solved": true, "steps": 41}
+GET /metrics gives the request counts and latency percentiles of every endpoint along with the queue gauges, and
+GET /health just answers. /ws upgrades to a WebSocket where each text message is {"id": ..., "op": "solve",
+"puzzle": "..."} and is answered with {"id": ..., "result": ...} or {"id": ..., "error": ...}, in the order they finish.
+The solving is CPU bound so it runs in a pool of worker processes, never on the event loop:
+- Identical requests that are already being worked on share the one result, so a burst of requests for the daily
+  puzzle costs a single solve.
+- Requests are collected for up to BATCH_WAIT seconds (or until BATCH_SIZE are waiting) and sent to a worker together,
+  which saves a round trip to the pool per puzzle.
+- At most max_pending distinct puzzles are queued or being worked on. Past that requests get a 503 with Retry-After
+  (or an error message on a WebSocket), and a WebSocket stops being read while WS_IN_FLIGHT of its messages are open.
+Run it with e.g.
+    python server.py --port 8765 --workers 4
+"""
+import argparse
+import asyncio
+import base64
+import concurrent.futures
+import hashlib
+import json
+import multiprocessing
+import os
+import struct
+import sys
+import time
+import logic
+import profiling
+import solver
+import validate
+
+BATCH_SIZE = 32 # Puzzles sent to a worker at a time
+BATCH_WAIT = 0.002 # Seconds to wait for more requests before sending a part filled batch
+MAX_PENDING = 1024 # Distinct puzzles queued or being worked on before requests are turned away
+MAX_BODY = 1 << 20 # Largest request body accepted, in bytes
+MAX_PUZZLES = 256 # Largest number of puzzles in one request
+WS_IN_FLIGHT = 64 # Messages of one WebSocket being worked on before it stops being read
+WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC11B65" # Fixed by RFC 6455 for the handshake
+
+REASONS = {200: "OK", 101: "Switching Protocols", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 431: "Request Header Fields Too Large", 500: "Internal Server Error",
+           501: "Not Implemented", 503: "Service Unavailable"}
+
+
+def solve(puzzle):
+    return {"solution": solver.solve(puzzle)}
+
+
+def check(puzzle):
+    result = validate.validate(puzzle)
+    return {"verdict": result.verdict, "solutions": result.solutions, "conflicts": result.conflicts, "error": result.error}
+
+
+def hint(puzzle):
+    step = logic.next_step(puzzle)
+    if step is None:
+        return None
+    return {"technique": step.technique, "placements": step.placements, "eliminations": step.eliminations,
+            "cells": step.cells}
+
+
+def grade(puzzle):
+    analysis = logic.analyse(puzzle)
+    return {"grade": analysis.grade, "score": analysis.score, "solved": analysis.solved, "steps": len(analysis.steps)}
+
+
+OPERATIONS = {"solve": solve, "validate": check, "hint": hint, "grade": grade}
+PATHS = set(["/health", "/metrics"] + ["/" + op for op in OPERATIONS]) # Anything else is timed as "other"
+
+
+def run_batch(jobs):
+    '''
+    Runs in the worker processes and works through a batch of requests
+    :param jobs: list of (operation name, puzzle)
+    :return: list: (result, None) or (None, error message) for each job in the same order
+    '''
+    results = []
+    for op, puzzle in jobs:
+        try:
+            results.append((OPERATIONS[op](puzzle), None))
+        except ValueError as error: # A malformed puzzle only fails its own request
+            results.append((None, str(error)))
+    return results
+
+
+class ServerBusy(Exception):
+    """
+    Raised when too many puzzles are already waiting
+    """
+
+
+class RequestError(Exception):
+    """
+    A request that can't be answered, carrying the HTTP status to reply with
+    """
+    def __init__(self, status, message):
+        Exception.__init__(self, message)
+        self.status = status
+
+
+class PuzzleService(object):
+    """
+    Hands requests to the worker pool, sharing the result of identical requests and sending them in batches
+    """
+    def __init__(self, executor, batch_size=BATCH_SIZE, batch_wait=BATCH_WAIT, max_pending=MAX_PENDING, profiler=None):
+        '''
+        :param executor: concurrent.futures executor that runs run_batch, normally a ProcessPoolExecutor. Its workers must
+                         not be forked from the server once it is accepting connections, or they hold on to the client
+                         sockets and closed connections never reach the client (main uses the spawn start method)
+        :param batch_size: Requests sent to a worker at a time
+        :param batch_wait: Seconds a part filled batch waits for more requests
+        :param max_pending: Distinct puzzles that can be queued or worked on at once
+        :param profiler: profiling.Profiler for the gauges, a new one if not given
+        '''
+        self.executor = executor
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_pending = max_pending
+        self.profiler = profiler or profiling.Profiler()
+        self.inflight = {} # (op, puzzle) -> asyncio.Future of the result, until the worker has answered
+        self.queue = [] # Keys waiting to be sent to a worker
+        self.flushHandle = None # The pending call_later of Flush
+        self.coalesced = 0 # Requests that were answered by another request's work
+        self.rejected = 0 # Requests turned away because too much was pending
+
+    async def Submit(self, op, puzzle):
+        '''
+        :param op: One of OPERATIONS
+        :param puzzle: Puzzle string
+        :return: The result of the operation
+        '''
+        if op not in OPERATIONS:
+            raise RequestError(404, "Unknown operation: " + str(op))
+        if not isinstance(puzzle, str):
+            raise RequestError(400, "The puzzle has to be a string")
+        key = (op, "".join(puzzle.split()).replace(".", "0")) # Written the same way, so equal puzzles share a key
+        future = self.inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            self.profiler.Gauge("coalesced", self.coalesced)
+        else:
+            if len(self.inflight) >= self.max_pending:
+                self.rejected += 1
+                self.profiler.Gauge("rejected", self.rejected)
+                raise ServerBusy("Too many puzzles waiting")
+            future = asyncio.get_running_loop().create_future()
+            self.inflight[key] = future
+            self.queue.append(key)
+            self.profiler.Gauge("pending", len(self.inflight))
+            if len(self.queue) >= self.batch_size:
+                self.Flush()
+            elif self.flushHandle is None:
+                self.flushHandle = asyncio.get_running_loop().call_later(self.batch_wait, self.Flush)
+        # Shielded so a client that goes away doesn't cancel the work the other requests for it are waiting on
+        result, error = await asyncio.shield(future)
+        if error is not None:
+            raise RequestError(400, error)
+        return result
+
+    def Flush(self):
+        '''
+        Sends everything waiting to the workers, batch_size at a time
+        :return: None
+        '''
+        if self.flushHandle is not None:
+            self.flushHandle.cancel()
+            self.flushHandle = None
+        loop = asyncio.get_running_loop()
+        while self.queue:
+            keys = self.queue[:self.batch_size]
+            del self.queue[:self.batch_size]
+            work = loop.run_in_executor(self.executor, run_batch, keys)
+            work.add_done_callback(lambda done, keys=keys: self.Finished(keys, done))
+
+    def Finished(self, keys, done):
+        '''
+        Passes the results of a batch on to everyone waiting for them
+        :param keys: The (op, puzzle) keys that were sent
+        :param done: Future of run_batch
+        :return: None
+        '''
+        error = done.exception()
+        results = done.result() if error is None else None
+        for index, key in enumerate(keys):
+            future = self.inflight.pop(key)
+            if future.done():
+                continue
+            if error is None:
+                future.set_result(results[index])
+            else: # e.g. a worker process died, every request in the batch fails
+                future.set_exception(error)
+        self.profiler.Gauge("pending", len(self.inflight))
+
+
+class PuzzleServer(object):
+    """
+    The HTTP and WebSocket side, one coroutine per connection
+    """
+    def __init__(self, service):
+        '''
+        :param service: PuzzleService doing the work
+        '''
+        self.service = service
+        self.profiler = service.profiler
+        self.connections = 0
+
+    async def HandleConnection(self, reader, writer):
+        '''
+        Serves the requests of one connection until it is closed, keeping it open between requests
+        :return: None
+        '''
+        self.connections += 1
+        self.profiler.Gauge("connections", self.connections)
+        try:
+            while True:
+                try:
+                    request = await self.ReadRequest(reader)
+                except RequestError as error:
+                    await self.Respond(writer, error.status, {"error": str(error)}, close=True)
+                    return
+                if request is None: # The client closed the connection
+                    return
+                method, path, headers, body = request
+                if path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                    await self.WebSocket(reader, writer, headers)
+                    return
+                start = time.perf_counter()
+                status, reply, extra = await self.Route(method, path, body)
+                close = headers.get("connection", "").lower() == "close"
+                await self.Respond(writer, status, reply, extra, close)
+                self.profiler.Record(method + " " + path if path in PATHS else "other", time.perf_counter() - start)
+                if close:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections -= 1
+            self.profiler.Gauge("connections", self.connections)
+            writer.close()
+
+    async def ReadRequest(self, reader):
+        '''
+        :return: (str, str, dict, bytes): method, path, lower case headers and body, or None at the end of the stream
+        '''
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as error:
+            if not error.partial.strip():
+                return None
+            raise RequestError(400, "Incomplete request")
+        except asyncio.LimitOverrunError:
+            raise RequestError(431, "Headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        parts = lines[0].split(" ")
+        if len(parts) != 3:
+            raise RequestError(400, "Bad request line")
+        method, path = parts[0], parts[1].split("?")[0]
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise RequestError(501, "Chunked bodies are not supported")
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise RequestError(400, "Bad Content-Length")
+        if length > MAX_BODY:
+            raise RequestError(413, "Body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method, path, headers, body
+
+    async def Respond(self, writer, status, reply, extra=(), close=False):
+        '''
+        Writes a JSON response and waits for the socket to take it, so a slow client holds up only itself
+        :return: None
+        '''
+        body = json.dumps(reply).encode("utf-8")
+        head = ["HTTP/1.1 %d %s" % (status, REASONS.get(status, "")), "Content-Type: application/json",
+                "Content-Length: %d" % len(body), "Connection: " + ("close" if close else "keep-alive")]
+        head.extend("%s: %s" % header for header in extra)
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def Route(self, method, path, body):
+        '''
+        :return: (int, object, list): Status, JSON reply and any extra headers
+        '''
+        if path == "/health":
+            return 200, {"ok": True}, []
+        if path == "/metrics":
+            stats = self.profiler.Stats()
+            return 200, {"endpoints": stats["methods"], "gauges": stats["gauges"]}, []
+        op = path.strip("/")
+        if op not in OPERATIONS:
+            return 404, {"error": "Not found"}, []
+        if method != "POST":
+            return 405, {"error": "Use POST"}, [("Allow", "POST")]
+        try:
+            request = json.loads(body or b"{}")
+            if not isinstance(request, dict):
+                raise RequestError(400, "Expected a JSON object")
+            if "puzzles" in request:
+                puzzles = request["puzzles"]
+                if not isinstance(puzzles, list) or len(puzzles) > MAX_PUZZLES:
+                    raise RequestError(413 if isinstance(puzzles, list) else 400,
+                                       "puzzles has to be a list of at most %d" % MAX_PUZZLES)
+                return 200, await self.Many(op, puzzles), []
+            if "puzzle" not in request:
+                raise RequestError(400, "No puzzle given")
+            return 200, await self.service.Submit(op, request["puzzle"]), []
+        except ValueError as error: # Not JSON
+            return 400, {"error": str(error)}, []
+        except RequestError as error:
+            return error.status, {"error": str(error)}, []
+        except ServerBusy as error:
+            return 503, {"error": str(error)}, [("Retry-After", "1")]
+        except Exception as error: # e.g. a worker process died, the server carries on
+            return 500, {"error": "%s: %s" % (type(error).__name__, error)}, []
+
+    async def Many(self, op, puzzles):
+        '''
+        Answers every puzzle of a batch request, each with its own result or error
+        :return: list of {"result": ...} or {"error": ...}
+        '''
+        async def One(puzzle):
+            try:
+                return {"result": await self.service.Submit(op, puzzle)}
+            except Exception as error:
+                return {"error": str(error)}
+        return list(await asyncio.gather(*[One(puzzle) for puzzle in puzzles]))
+
+    async def WebSocket(self, reader, writer, headers):
+        '''
+        Completes the WebSocket handshake and then answers messages until the client closes
+        :return: None
+        '''
+        key = headers.get("sec-websocket-key", "").encode("latin-1")
+        accept = base64.b64encode(hashlib.sha1(key + WS_GUID).digest()).decode("ascii")
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      "Sec-WebSocket-Accept: " + accept + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+        lock = asyncio.Lock() # Only one frame is written (and drained) at a time
+        slots = asyncio.Semaphore(WS_IN_FLIGHT)
+        tasks = set()
+
+        async def Send(opcode, payload):
+            async with lock:
+                writer.write(ws_frame(opcode, payload))
+                await writer.drain()
+
+        async def Answer(text):
+            start = time.perf_counter()
+            name = "ws"
+            try:
+                message = json.loads(text)
+                if not isinstance(message, dict):
+                    raise RequestError(400, "Expected a JSON object")
+                if message.get("op") in OPERATIONS:
+                    name = "ws " + message["op"]
+                reply = {"id": message.get("id")}
+                try:
+                    reply["result"] = await self.service.Submit(message.get("op"), message.get("puzzle"))
+                except Exception as error:
+                    reply["error"] = str(error)
+            except (ValueError, RequestError) as error:
+                reply = {"id": None, "error": str(error)}
+            try:
+                await Send(0x1, json.dumps(reply).encode("utf-8"))
+            except ConnectionError:
+                pass
+            finally:
+                slots.release()
+                self.profiler.Record(name, time.perf_counter() - start)
+
+        try:
+            while True:
+                opcode, payload = await ws_read(reader, lambda data: Send(0xA, data))
+                if opcode == 0x8: # Close, echoed back
+                    await Send(0x8, payload[:2])
+                    return
+                if opcode == 0x1:
+                    await slots.acquire() # Waits here, and so stops reading, while too many are open
+                    task = asyncio.ensure_future(Answer(payload.decode("utf-8", "replace")))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+        finally:
+            for task in list(tasks):
+                task.cancel()
+
+
+def ws_frame(opcode, payload):
+    '''
+    :return: bytes: One unmasked, unfragmented WebSocket frame as sent by a server
+    '''
+    length = len(payload)
+    if length < 126:
+        head = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        head = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        head = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return head + payload
+
+
+async def ws_read(reader, pong):
+    '''
+    Reads one whole WebSocket message, joining fragments and unmasking it. Pings are answered as they arrive, even
+    between the fragments of a message.
+    :param reader: asyncio.StreamReader of the connection
+    :param pong: Coroutine function called with the payload of each ping
+    :return: (int, bytes): Opcode and payload of a text, binary or close message
+    '''
+    message = b""
+    first_opcode = None
+    while True:
+        head = await reader.readexactly(2)
+        fin = head[0] & 0x80
+        opcode = head[0] & 0x0F
+        length = head[1] & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await reader.readexactly(8))[0]
+        if length > MAX_BODY:
+            raise ConnectionError("WebSocket message too large")
+        mask = await reader.readexactly(4) if head[1] & 0x80 else None
+        payload = await reader.readexactly(length)
+        if mask is not None: # XORed as one big number rather than byte by byte
+            key = (mask * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(length, "big")
+        if opcode == 0x9: # Ping
+            await pong(payload)
+            continue
+        if opcode == 0xA: # Pong, nothing to do
+            continue
+        if opcode == 0x8: # Close, whatever was half sent is dropped
+            return opcode, payload
+        if first_opcode is None:
+            first_opcode = opcode
+        message += payload
+        if len(message) > MAX_BODY:
+            raise ConnectionError("WebSocket message too large")
+        if fin:
+            return first_opcode, message
+
+
+async def serve(host, port, executor, **options):
+    '''
+    Starts the server and runs it until cancelled
+    :param options: Passed on to PuzzleService
+    :return: None
+    '''
+    server = PuzzleServer(PuzzleService(executor, **options))
+    listener = await asyncio.start_server(server.HandleConnection, host, port)
+    print("Serving on " + ", ".join("%s:%d" % sock.getsockname()[:2] for sock in listener.sockets), file=sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Sudoku solver, validator, hints and grading over HTTP and WebSocket")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("-p", "--port", type=int, default=8765, help="port to listen on (default: 8765)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: all cores)")
+    parser.add_argument("-b", "--batch-size", type=int, default=BATCH_SIZE, help="puzzles sent to a worker at a time (default: %d)" % BATCH_SIZE)
+    parser.add_argument("--batch-wait", type=float, default=BATCH_WAIT * 1000, help="milliseconds to wait to fill a batch (default: %g)" % (BATCH_WAIT * 1000))
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING, help="puzzles waiting before requests get a 503 (default: %d)" % MAX_PENDING)
+    args = parser.parse_args(argv)
+    if args.batch_size < 1 or args.max_pending < 1:
+        parser.error("--batch-size and --max-pending must be at least 1")
+
+    context = multiprocessing.get_context("spawn") # Fresh workers that don't inherit the server's sockets
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers, mp_context=context) as executor:
+        try:
+            asyncio.run(serve(args.host, args.port, executor, batch_size=args.batch_size, batch_wait=args.batch_wait / 1000,
+                              max_pending=args.max_pending))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
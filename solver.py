@@ -0,0 +1,255 @@
+"""
+Headless Sudoku solver.
+Nothing in here touches tkinter so it can be used from the command line, worker processes or the GameBoard alike.
+Grids use the same format as the puzzles file, one character per cell with 0 or . for an empty cell (81 cells on a
+normal board, 256 or 625 for 16x16 and 25x25 boards whose digits carry on into letters, see engine.SYMBOLS), and
+candidates are masks where bit 0 = digit 1 ... bit 8 = digit 9, exactly as in engine.BoardState.
+Every cell keeps its own candidate mask. Placing a digit removes it from the peers of the cell (20 on a 9x9 board) and
+any peer left with a single candidate is placed straight away (naked singles), then each unit is checked for a digit
+with only one home (hidden singles). When nothing more can be deduced the search guesses on the cell with the fewest
+remaining candidates (minimum remaining values) and backtracks on a contradiction.
+"""
+
+# The units and peers are shared with the GUI board state
+import engine
+from engine import SYMBOLS, VALUES
+
+
+def parse_grid(grid):
+    '''
+    Turns a puzzle into a list of ints
+    :param grid: String with a character per cell (whitespace and newlines are ignored, 0 or . are empty) or an iterable
+                 of ints, 81 cells for a 9x9 board or 16, 256 or 625 for the other sizes
+    :return: list: An int per cell with 0 for the empty cells
+    '''
+    if isinstance(grid, str):
+        try:
+            cells = [VALUES[ch] for ch in grid if not ch.isspace()]
+        except KeyError as error:
+            raise ValueError("Not a Sudoku digit: " + str(error))
+    else:
+        cells = [int(value) for value in grid]
+    size = engine.geometry_for(len(cells)).SIZE # Raises ValueError for a cell count that isn't a board
+    if any(value > size for value in cells):
+        raise ValueError("A digit is too big for a %dx%d board" % (size, size))
+    return cells
+
+
+def _start(grid):
+    '''
+    Sets up the candidates for a puzzle
+    :return: (Geometry, list, list): The board's tables, candidate masks and fixed digits, or None for the lists if
+             the givens clash with each other
+    '''
+    cells = parse_grid(grid)
+    geometry = engine.geometry_for(len(cells))
+    cand = [geometry.ALL] * geometry.CELLS # Candidate mask of every cell
+    fixed = [0] * geometry.CELLS # Digits that have been fixed
+    for i, num in enumerate(cells):
+        if num and not _assign(cand, fixed, i, 1 << (num - 1), geometry.PEERS):
+            return geometry, None, None
+    return geometry, cand, fixed
+
+
+def solve(grid):
+    '''
+    Solves a puzzle
+    :param grid: Puzzle in any format accepted by parse_grid
+    :return: str: The solution as one character per cell, or None if the puzzle has no solution
+    '''
+    geometry, cand, cells = _start(grid)
+    if cand is None:
+        return None
+    solution = _search(cand, cells, geometry)
+    if solution is None:
+        return None
+    return "".join(SYMBOLS[num - 1] for num in solution)
+
+
+def _assign(cand, cells, i, bit, peers):
+    '''
+    Fixes the digit bit in cell i and removes it from every peer, following on with any naked singles this creates
+    :param cand: Candidate masks, updated in place
+    :param cells: Fixed digits, updated in place
+    :param i: Cell index
+    :param bit: Single digit bit to place
+    :param peers: The board's Geometry.PEERS
+    :return: bool: False if a contradiction was found
+    '''
+    stack = [(i, bit)]
+    while stack:
+        i, bit = stack.pop()
+        if cells[i]: # Already fixed, which is only okay if it was fixed to the same digit
+            if cand[i] != bit:
+                return False
+            continue
+        if not cand[i] & bit:
+            return False
+        cells[i] = bit.bit_length()
+        cand[i] = bit
+        for peer in peers[i]:
+            mask = cand[peer]
+            if mask & bit:
+                mask ^= bit
+                if not mask: # Nothing can go in the peer any more
+                    return False
+                cand[peer] = mask
+                if not mask & (mask - 1) and not cells[peer]: # Naked single
+                    stack.append((peer, mask))
+    return True
+
+
+def _hidden_singles(cand, cells, geometry):
+    '''
+    Places every digit that only has one possible cell in a row, column or box until none are left
+    :return: bool: False if a contradiction was found
+    '''
+    full = geometry.ALL
+    peers = geometry.PEERS
+    progress = True
+    while progress:
+        progress = False
+        for unit in geometry.UNITS:
+            once = 0
+            twice = 0
+            for i in unit:
+                mask = cand[i]
+                twice |= once & mask
+                once |= mask
+            if once != full: # Some digit has nowhere left to go in this unit
+                return False
+            hidden = once & ~twice
+            if hidden:
+                for i in unit:
+                    mask = cand[i] & hidden
+                    if mask and not cells[i]:
+                        if mask & (mask - 1): # Two digits that both need this cell
+                            return False
+                        if not _assign(cand, cells, i, mask, peers):
+                            return False
+                        progress = True
+    return True
+
+
+def _most_constrained(cand, cells, geometry):
+    '''
+    :return: int: The open cell with the fewest candidates, or -1 if every cell is fixed
+    '''
+    bit_count = geometry.BIT_COUNT
+    best = -1
+    best_count = geometry.SIZE + 1
+    for i in range(geometry.CELLS):
+        if not cells[i]:
+            count = bit_count[cand[i]]
+            if count < best_count:
+                best = i
+                best_count = count
+                if count == 2: # Can't do better than two
+                    break
+    return best
+
+
+def _search(cand, cells, geometry):
+    '''
+    Propagates and then guesses on the most constrained cell, backtracking on failure
+    :return: list: The solved digits or None if this branch has no solution
+    '''
+    if not _hidden_singles(cand, cells, geometry):
+        return None
+    best = _most_constrained(cand, cells, geometry)
+    if best == -1: # Everything is fixed
+        return cells
+    mask = cand[best]
+    while mask:
+        bit = mask & -mask
+        mask ^= bit
+        trial_cand = cand[:]
+        trial_cells = cells[:]
+        if _assign(trial_cand, trial_cells, best, bit, geometry.PEERS):
+            solution = _search(trial_cand, trial_cells, geometry)
+            if solution is not None:
+                return solution
+    return None
+
+
+def count_solutions(grid, limit=2):
+    '''
+    Counts the solutions of a puzzle, stopping as soon as limit have been found
+    :param grid: Puzzle in any format accepted by parse_grid
+    :param limit: Stop counting once this many solutions are found (2 is enough to tell if a puzzle is unique)
+    :return: int: Number of solutions found, at most limit
+    '''
+    geometry, cand, cells = _start(grid)
+    if cand is None:
+        return 0
+    return _count(cand, cells, limit, geometry)
+
+
+def _count(cand, cells, limit, geometry):
+    '''
+    Same as _search but carries on after the first solution
+    :return: int: Solutions in this branch, at most limit
+    '''
+    if not _hidden_singles(cand, cells, geometry):
+        return 0
+    best = _most_constrained(cand, cells, geometry)
+    if best == -1:
+        return 1
+    found = 0
+    mask = cand[best]
+    while mask:
+        bit = mask & -mask
+        mask ^= bit
+        trial_cand = cand[:]
+        trial_cells = cells[:]
+        if _assign(trial_cand, trial_cells, best, bit, geometry.PEERS):
+            found += _count(trial_cand, trial_cells, limit - found, geometry)
+            if found >= limit:
+                break
+    return found
+
+
+def random_solution(rng, box_size=3):
+    '''
+    Builds a random completed grid by running the search with the guesses made in a random order
+    :param rng: random.Random to draw from
+    :param box_size: 3 for a 9x9 grid, 4 for 16x16 and so on
+    :return: str: One character per cell
+    '''
+    geometry = engine.geometry(box_size)
+    cand = [geometry.ALL] * geometry.CELLS
+    cells = [0] * geometry.CELLS
+    return "".join(SYMBOLS[num - 1] for num in _random_search(cand, cells, rng, geometry))
+
+
+def _random_search(cand, cells, rng, geometry):
+    '''
+    Same as _search but guesses a random cell among the most constrained and tries its digits in a random order
+    :return: list: The digits of every cell or None
+    '''
+    if not _hidden_singles(cand, cells, geometry):
+        return None
+    bit_count = geometry.BIT_COUNT
+    best_count = geometry.SIZE + 1
+    choices = []
+    for i in range(geometry.CELLS):
+        if not cells[i]:
+            count = bit_count[cand[i]]
+            if count < best_count:
+                best_count = count
+                choices = [i]
+            elif count == best_count:
+                choices.append(i)
+    if not choices:
+        return cells
+    best = rng.choice(choices)
+    bits = [1 << (num - 1) for num in geometry.DIGITS_OF[cand[best]]]
+    rng.shuffle(bits)
+    for bit in bits:
+        trial_cand = cand[:]
+        trial_cells = cells[:]
+        if _assign(trial_cand, trial_cells, best, bit, geometry.PEERS):
+            solution = _random_search(trial_cand, trial_cells, rng, geometry)
+            if solution is not None:
+                return solution
+    return None
@@ -0,0 +1,250 @@
+"""
+Statistics over puzzle collections of any size, for planning what to publish.
+The puzzles are streamed through generator stages, so memory stays the same however many there are:
+    read (loader.PuzzleFile) -> parse -> measure -> Aggregate
+For every puzzle the stages count the givens, the candidates left by the basic rules, the naked and hidden singles on
+the starting board (found by the hints.MoveQueue behind the GameBoard's hints, without the GUI) and the steps of each
+technique the logical solver needs. An Aggregate only holds histograms, so the partial aggregates of worker processes are
+merged into one at the end. The totals can be written as CSV (statistic,value,count rows) or JSON, e.g.
+    python stats.py corpus.txt --csv stats.csv --json stats.json --workers 8
+"""
+import argparse
+import collections
+import csv
+import json
+import os
+import sys
+import time
+import engine
+import hints
+import loader
+import logic
+import solver
+
+# givens: filled cells, candidates: candidates of the empty cells added up, naked/hidden: singles on the starting board,
+# techniques: Counter of technique -> steps (None when not measured), grade/score: from logic.analyse
+Measure = collections.namedtuple("Measure", "givens candidates naked hidden techniques grade score")
+
+HISTOGRAMS = ("givens", "candidates", "naked_singles", "hidden_singles", "grades") # Counters of an Aggregate
+
+
+def parse(puzzles):
+    '''
+    Turns puzzle strings into boards, dropping anything that isn't a puzzle
+    :param puzzles: Iterable of puzzle strings
+    :return: Generator of (puzzle, engine.BoardState), or (puzzle, None) for a malformed one so it can be counted
+    '''
+    for puzzle in puzzles:
+        try:
+            cells = solver.parse_grid(puzzle)
+        except ValueError:
+            yield puzzle, None
+            continue
+        yield puzzle, engine.BoardState(cells)
+
+
+def singles(state):
+    '''
+    Counts the moves the basic rules give straight away, found by the same hints.MoveQueue the GameBoard hints come from
+    :param state: engine.BoardState
+    :return: (int, int): Naked singles (cells with one candidate) and hidden singles (cells that are the only place for
+             a digit in a row, column or box, not counting the naked singles)
+    '''
+    moves = hints.MoveQueue(state)
+    return len(moves.naked), len(set(moves.Hidden()) - set(moves.naked))
+
+
+def measure(boards, techniques=True):
+    '''
+    :param boards: Iterable from parse
+    :param techniques: Run the logical solver for the technique counts and grade, by far the slowest part
+    :return: Generator of Measure, or None for each malformed puzzle
+    '''
+    for puzzle, state in boards:
+        if state is None:
+            yield None
+            continue
+        bit_count = state.geometry.BIT_COUNT
+        naked, hidden = singles(state)
+        used, grade, score = None, None, None
+        if techniques:
+            analysis = logic.analyse(state.cells)
+            used = collections.Counter(step.technique for step in analysis.steps)
+            grade, score = analysis.grade, analysis.score
+        yield Measure(state.filled, sum(bit_count[mask] for mask in state.candidates), naked, hidden, used, grade, score)
+
+
+class Aggregate(object):
+    """
+    Histograms of everything measured. Two aggregates add up with Merge, so each worker can build its own.
+    """
+    def __init__(self):
+        self.puzzles = 0 # Puzzles measured
+        self.malformed = 0 # Puzzles that couldn't be read
+        self.givens = collections.Counter() # Number of givens -> puzzles
+        self.candidates = collections.Counter() # Candidate total -> puzzles
+        self.naked_singles = collections.Counter() # Naked singles at the start -> puzzles
+        self.hidden_singles = collections.Counter() # Hidden singles at the start -> puzzles
+        self.grades = collections.Counter() # Grade -> puzzles
+        self.steps = collections.Counter() # Technique -> steps over every puzzle
+        self.needing = collections.Counter() # Technique -> puzzles that used it at least once
+        self.score = 0 # Difficulty scores added up
+
+    def Add(self, result):
+        '''
+        :param result: Measure, or None for a malformed puzzle
+        :return: None
+        '''
+        if result is None:
+            self.malformed += 1
+            return
+        self.puzzles += 1
+        self.givens[result.givens] += 1
+        self.candidates[result.candidates] += 1
+        self.naked_singles[result.naked] += 1
+        self.hidden_singles[result.hidden] += 1
+        if result.techniques is not None:
+            self.grades[result.grade] += 1
+            self.steps.update(result.techniques)
+            self.needing.update(result.techniques.keys())
+            self.score += result.score
+
+    def Merge(self, other):
+        '''
+        Adds another aggregate into this one
+        :return: Aggregate: self
+        '''
+        self.puzzles += other.puzzles
+        self.malformed += other.malformed
+        for name in HISTOGRAMS + ("steps", "needing"):
+            getattr(self, name).update(getattr(other, name))
+        self.score += other.score
+        return self
+
+    def Summary(self):
+        '''
+        :return: dict: The single number statistics
+        '''
+        graded = sum(self.grades.values())
+        return {"puzzles": self.puzzles, "malformed": self.malformed,
+                "mean_givens": mean(self.givens), "mean_candidates": mean(self.candidates),
+                "mean_naked_singles": mean(self.naked_singles), "mean_hidden_singles": mean(self.hidden_singles),
+                "mean_score": self.score / graded if graded else None}
+
+    def ToDict(self):
+        '''
+        :return: dict: Everything, in a form that json can write (histogram keys become strings)
+        '''
+        result = {"summary": self.Summary()}
+        for name in HISTOGRAMS:
+            result[name] = dict((str(value), count) for value, count in sorted(getattr(self, name).items()))
+        result["technique_steps"] = dict(self.steps.most_common())
+        result["technique_puzzles"] = dict(self.needing.most_common())
+        return result
+
+    def Rows(self):
+        '''
+        :return: Generator of (statistic, value, count) rows for the CSV file
+        '''
+        for name, value in self.Summary().items():
+            yield "summary", name, value
+        for name in HISTOGRAMS:
+            for value, count in sorted(getattr(self, name).items()):
+                yield name, value, count
+        for technique, count in self.steps.most_common():
+            yield "technique_steps", technique, count
+        for technique, count in self.needing.most_common():
+            yield "technique_puzzles", technique, count
+
+    def WriteCSV(self, path):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(("statistic", "value", "count"))
+            writer.writerows(self.Rows())
+
+    def WriteJSON(self, path):
+        with open(path, "w") as f:
+            json.dump(self.ToDict(), f, indent=2)
+
+
+def mean(histogram):
+    '''
+    :param histogram: Counter of value -> how often
+    :return: float: The mean value or None if it is empty
+    '''
+    total = sum(histogram.values())
+    if not total:
+        return None
+    return sum(value * count for value, count in histogram.items()) / total
+
+
+def aggregate(puzzles, techniques=True):
+    '''
+    Runs the stages over a stream of puzzles
+    :param puzzles: Iterable of puzzle strings
+    :param techniques: See measure
+    :return: Aggregate
+    '''
+    result = Aggregate()
+    for measured in measure(parse(puzzles), techniques):
+        result.Add(measured)
+    return result
+
+
+def AggregateChunk(puzzles, techniques):
+    '''
+    Runs in the worker processes
+    :param puzzles: List of puzzle strings
+    :return: Aggregate of just these puzzles
+    '''
+    return aggregate(puzzles, techniques)
+
+
+def AggregateFile(puzzles, workers, chunk_size, techniques=True):
+    '''
+    Aggregates a whole collection on a pool of worker processes. Only a fixed number of chunks are in flight (see
+    loader.map_chunks) and each partial aggregate is merged as it comes back, so memory doesn't grow with the collection.
+    :param puzzles: Iterable of puzzle strings, e.g. a loader.PuzzleFile
+    :param workers: Number of worker processes (1 works in this process)
+    :param chunk_size: Number of puzzles sent to a worker at a time
+    :param techniques: See measure
+    :return: Aggregate
+    '''
+    total = Aggregate()
+    for chunk, partial in loader.map_chunks(AggregateChunk, puzzles, workers, chunk_size, techniques):
+        total.Merge(partial)
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Statistics of the puzzles in a collection")
+    parser.add_argument("input", help="puzzle file (see loader.py, plain or gzip)")
+    parser.add_argument("--csv", help="write statistic,value,count rows to this file")
+    parser.add_argument("--json", help="write the statistics to this file as JSON")
+    parser.add_argument("--no-techniques", action="store_true", help="skip the logical solver (no grades or technique counts)")
+    parser.add_argument("-s", "--size", type=int, default=9, help="rows in each puzzle: 9, 16 or 25 (default: 9)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: all cores)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=256, help="puzzles sent to a worker at a time (default: 256)")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    try:
+        box_size = engine.geometry_for(args.size * args.size).BOX_SIZE
+    except ValueError as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    result = AggregateFile(loader.PuzzleFile(args.input, box_size=box_size), args.workers, args.chunk_size,
+                           not args.no_techniques)
+    if args.csv:
+        result.WriteCSV(args.csv)
+    if args.json:
+        result.WriteJSON(args.json)
+    if not args.csv and not args.json: # Nowhere else to go
+        json.dump(result.ToDict(), sys.stdout, indent=2)
+        print()
+    print("Measured %d puzzles in %.2fs" % (result.puzzles, time.perf_counter() - start), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import history
+import savegame
+
+PUZZLE = "003020600900305001001806400008102900700000008006708200002609500800203009005010300"
+
+
+def game_with_cells(cells, actions=(), position=0):
+    pencils = tuple(0b101 if num == "0" else 0 for num in cells)
+    return savegame.Game(PUZZLE, cells, pencils, list(actions), position, 12.5)
+
+
+def test_round_trip():
+    game = game_with_cells(PUZZLE[:3] + "4" + PUZZLE[4:], [(history.Move("digit", 3, 0, 4),)], 1)
+    assert savegame.decode(savegame.encode(game)) == game
+
+
+def test_overwritten_given_survives():
+    # The 3 at cell 2 is a given the player has typed a 5 over
+    game = game_with_cells(PUZZLE[:2] + "5" + PUZZLE[3:], [(history.Move("digit", 2, 3, 5),)], 1)
+    loaded = savegame.decode(savegame.encode(game))
+    assert loaded.givens == PUZZLE
+    assert loaded.cells == game.cells
+
+
+def test_erased_given_survives():
+    game = game_with_cells(PUZZLE[:2] + "0" + PUZZLE[3:], [(history.Move("digit", 2, 3, 0),)], 1)
+    loaded = savegame.decode(savegame.encode(game))
+    assert loaded.givens == PUZZLE
+    assert loaded.cells == game.cells
+
+
+def test_reads_version_1():
+    data = bytearray(savegame.encode(game_with_cells(PUZZLE)))
+    count = sum(num != "0" for num in PUZZLE)
+    del data[16:16 + (count + 1) // 2] # Version 1 had only the givens bitmap
+    data[3] = 1
+    assert savegame.decode(bytes(data)).givens == PUZZLE
@@ -0,0 +1,167 @@
+"""
+Checks that puzzles are fit to play.
+A puzzle is first checked for givens that clash (the same digit twice in a row, column or box), which rules it out
+straight away. Otherwise its solutions are counted with the solver, stopping as soon as the limit is reached, and the
+result is reported as "0" (no solution), "1" (a proper puzzle with a unique solution) or "many". Anything that isn't a
+puzzle at all, such as a line with the wrong number of cells, is reported as "invalid".
+The GameBoard runs this on every puzzle it loads. Run it from the command line to check a whole collection in parallel
+and write a report, optionally keeping just the unique puzzles, e.g.
+    python validate.py corpus.txt -o report.tsv --keep unique.txt
+"""
+import argparse
+import collections
+import os
+import sys
+import time
+import engine
+import loader
+import solver
+
+# verdict: "0", "1", "many" or "invalid"
+# solutions: number of solutions found, at most the limit
+# conflicts: tuple of (index, index) pairs of givens that clash, each pair in ascending order
+# error: why the puzzle is invalid, None otherwise
+Validation = collections.namedtuple("Validation", "verdict solutions conflicts error")
+
+# What the GameBoard shows for a puzzle that can't be played properly
+MESSAGES = {"0": "Puzzle has no solution", "many": "Puzzle has more than one solution", "invalid": "Not a Sudoku puzzle"}
+
+
+def verdict(solutions):
+    '''
+    :param solutions: Number of solutions found
+    :return: str: "0", "1" or "many"
+    '''
+    if solutions > 1:
+        return "many"
+    return str(solutions)
+
+
+def conflicts(grid):
+    '''
+    Finds the givens that break the rules before any solving is done
+    :param grid: Puzzle in any format accepted by solver.parse_grid
+    :return: tuple: (index, index) pairs of cells holding the same digit in a row, column or box
+    '''
+    cells = solver.parse_grid(grid)
+    geometry = engine.geometry_for(len(cells))
+    clashes = set()
+    for unit in geometry.UNITS:
+        seen = {} # digit -> cells in this unit holding it
+        for i in unit:
+            num = cells[i]
+            if num:
+                for other in seen.setdefault(num, []):
+                    clashes.add((other, i) if other < i else (i, other)) # A pair sharing a row and box is found twice
+                seen[num].append(i)
+    return tuple(sorted(clashes))
+
+
+def validate(grid, limit=2):
+    '''
+    Checks a puzzle for clashing givens and counts its solutions
+    :param grid: Puzzle in any format accepted by solver.parse_grid
+    :param limit: Stop counting after this many solutions, at least 2 so that "1" and "many" can be told apart
+    :return: Validation
+    '''
+    if limit < 2:
+        raise ValueError("The solution limit has to be at least 2")
+    try:
+        cells = solver.parse_grid(grid)
+    except ValueError as error:
+        return Validation("invalid", 0, (), str(error))
+    clashes = conflicts(cells)
+    if clashes: # No need to search, nothing can satisfy these givens
+        return Validation("0", 0, clashes, None)
+    solutions = solver.count_solutions(cells, limit)
+    return Validation(verdict(solutions), solutions, (), None)
+
+
+def ValidateChunk(puzzles, limit):
+    '''
+    Runs in the worker processes and validates a batch of puzzles
+    :param puzzles: List of puzzle strings
+    :param limit: Solution limit passed to validate
+    :return: list: Validation of each puzzle in the same order
+    '''
+    return [validate(puzzle, limit) for puzzle in puzzles]
+
+
+def WriteChunk(out, keep, first, puzzles, results):
+    '''
+    Writes the report lines of one finished chunk, and its unique puzzles to keep
+    :param out: Open text file for the report
+    :param keep: Open text file for the unique puzzles or None
+    :param first: Number of the first puzzle in the chunk
+    :return: collections.Counter: Puzzles per verdict
+    '''
+    lines = []
+    counts = collections.Counter()
+    for number, (puzzle, result) in enumerate(zip(puzzles, results), first):
+        pairs = ",".join("%d-%d" % pair for pair in result.conflicts)
+        lines.append("%d\t%s\t%s\t%d\t%s\n" % (number, puzzle, result.verdict, result.solutions, pairs or "-"))
+        counts[result.verdict] += 1
+        if keep is not None and result.verdict == "1":
+            keep.write(puzzle + "\n")
+    out.write("".join(lines))
+    return counts
+
+
+def ValidateFile(puzzles, out, workers, chunk_size, limit=2, keep=None):
+    '''
+    Validates every puzzle in a collection on a pool of worker processes and writes the report to out in input order.
+    Only a fixed number of chunks are in flight (see loader.map_chunks), whatever the size of the collection.
+    Each report line is: puzzle number, puzzle, verdict, solutions found, clashing cell pairs (or -)
+    :param puzzles: Iterable of puzzle strings, e.g. a loader.PuzzleFile
+    :param out: Open output file for the report
+    :param workers: Number of worker processes (1 validates in this process)
+    :param chunk_size: Number of puzzles sent to a worker at a time
+    :param limit: Solution limit passed to validate
+    :param keep: Open output file that gets the puzzles with a unique solution, one per line, or None
+    :return: collections.Counter: Puzzles per verdict
+    '''
+    counts = collections.Counter()
+    total = 0
+    for chunk, results in loader.map_chunks(ValidateChunk, puzzles, workers, chunk_size, limit):
+        counts += WriteChunk(out, keep, total, chunk, results)
+        total += len(chunk)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check that every Sudoku puzzle in a file has a unique solution")
+    parser.add_argument("input", help="puzzle file (see loader.py, plain or gzip)")
+    parser.add_argument("-o", "--output", help="where to write the report (default: standard output)")
+    parser.add_argument("-k", "--keep", help="file to write the puzzles with a unique solution to")
+    parser.add_argument("-l", "--limit", type=int, default=2, help="stop counting solutions at this many (default: 2)")
+    parser.add_argument("-s", "--size", type=int, default=9, help="rows in each puzzle: 9, 16 or 25 (default: 9)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: all cores)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=256, help="puzzles sent to a worker at a time (default: 256)")
+    args = parser.parse_args(argv)
+    if args.chunk_size < 1:
+        parser.error("--chunk-size must be at least 1")
+    if args.limit < 2:
+        parser.error("--limit must be at least 2")
+    try:
+        box_size = engine.geometry_for(args.size * args.size).BOX_SIZE
+    except ValueError as error:
+        parser.error(str(error))
+
+    start = time.perf_counter()
+    out = open(args.output, "w") if args.output else sys.stdout
+    keep = open(args.keep, "w") if args.keep else None
+    try:
+        counts = ValidateFile(loader.PuzzleFile(args.input, box_size=box_size), out, args.workers, args.chunk_size,
+                              args.limit, keep)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if keep is not None:
+            keep.close()
+    elapsed = time.perf_counter() - start
+    print("Checked %d puzzles in %.2fs: %d unique, %d with many solutions, %d with none, %d invalid"
+          % (sum(counts.values()), elapsed, counts["1"], counts["many"], counts["0"], counts["invalid"]), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Candidate analysis for many boards at once using NumPy.
+Boards are (N, 9, 9) uint8 arrays with 0 for an empty cell. Candidates come back as (N, 9, 9, 9) boolean arrays where
+candidates[n, row, col, num - 1] is True if num could legally go into that cell of board n.
+Everything is done with broadcast reductions over the rows, columns and 3x3 boxes so there are no Python loops over
+cells and a single board is simply the N = 1 case.
+16x16 and 25x25 boards work the same way as (N, 16, 16) or (N, 25, 25) arrays, the box size is taken from the shape.
+"""
+import numpy as np
+
+from engine import VALUES, geometry_for
+
+DIGITS = np.arange(1, 26, dtype=np.uint8) # Compared against the boards to one-hot encode them (sliced to the board size)
+CODES = np.zeros(256, dtype=np.uint8) # Character code -> digit, so letters work for the bigger boards
+for _ch, _num in VALUES.items():
+    CODES[ord(_ch)] = _num
+
+
+def _box_size(size):
+    '''
+    :param size: Cells along a side of the board
+    :return: int: Width of a box
+    '''
+    n = int(round(size ** 0.5))
+    if n * n != size:
+        raise ValueError("Not a Sudoku board size: " + str(size))
+    return n
+
+
+def to_array(puzzles):
+    '''
+    Converts puzzle strings into a board array
+    :param puzzles: Iterable of 81 character strings (0 or . for empty cells), or 256/625 for the bigger boards as long
+                    as they are all the same size
+    :return: np.ndarray: (N, 9, 9) uint8, (N, 16, 16) or (N, 25, 25) for the bigger boards
+    '''
+    rows = [puzzle.encode("ascii") for puzzle in puzzles]
+    size = geometry_for(len(rows[0])).SIZE if rows else 9
+    return CODES[np.frombuffer(b"".join(rows), dtype=np.uint8)].reshape(-1, size, size)
+
+
+def candidates(boards):
+    '''
+    Works out every legal digit for every cell of every board
+    :param boards: (N, 9, 9) uint8 array
+    :return: np.ndarray: (N, 9, 9, 9) bool
+    '''
+    boards = np.asarray(boards, dtype=np.uint8)
+    size = boards.shape[-1]
+    n = _box_size(size)
+    placed = boards[..., None] == DIGITS[:size] # (N, 9, 9, 9) True where the cell holds that digit
+    row_used = placed.any(axis=2) # (N, row, num)
+    col_used = placed.any(axis=1) # (N, col, num)
+    # Splitting rows and columns into (band, row in band) and (stack, col in stack) lets the boxes reduce the same way
+    box_used = placed.reshape(-1, n, n, n, n, size).any(axis=(2, 4)) # (N, band, stack, num)
+    used = row_used[:, :, None, :] | col_used[:, None, :, :]
+    used = used.reshape(-1, n, n, n, n, size) | box_used[:, :, None, :, None, :]
+    return ~used.reshape(-1, size, size, size) & (boards == 0)[..., None]
+
+
+def naked_singles(cands):
+    '''
+    Finds the cells that only have one candidate left
+    :param cands: (N, 9, 9, 9) bool from candidates
+    :return: np.ndarray: (N, 9, 9) uint8 holding the digit for each naked single and 0 elsewhere
+    '''
+    single = cands.sum(axis=3) == 1
+    return np.where(single, cands.argmax(axis=3) + 1, 0).astype(np.uint8)
+
+
+def hidden_singles(cands):
+    '''
+    Finds the cells that are the only place left for a digit in their row, column or box
+    :param cands: (N, 9, 9, 9) bool from candidates
+    :return: np.ndarray: (N, 9, 9) uint8 holding the digit for each hidden single and 0 elsewhere
+    '''
+    row_once = cands.sum(axis=2, keepdims=True) == 1 # (N, 9, 1, 9) digit appears once in the row
+    col_once = cands.sum(axis=1, keepdims=True) == 1 # (N, 1, 9, 9)
+    size = cands.shape[-1]
+    n = _box_size(size)
+    boxes = cands.reshape(-1, n, n, n, n, size)
+    box_once = (boxes.sum(axis=(2, 4), keepdims=True) == 1) # (N, 3, 1, 3, 1, 9)
+    box_once = np.broadcast_to(box_once, boxes.shape).reshape(cands.shape)
+    hidden = cands & (row_once | col_once | box_once)
+    return np.where(hidden.any(axis=3), hidden.argmax(axis=3) + 1, 0).astype(np.uint8)